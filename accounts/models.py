@@ -5,6 +5,7 @@ import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import RegexValidator
 
@@ -97,6 +98,16 @@ class User(AbstractBaseUser, PermissionsMixin):
     def is_tenant(self):
         """Vérifie si l'utilisateur est un locataire."""
         return self.user_type == 'tenant'
+    
+    @cached_property
+    def role(self):
+        """
+        Rôle effectif de l'utilisateur pour le contrôle d'accès, calculé une seule
+        fois par instance : 'staff' pour les administrateurs, sinon user_type.
+        """
+        if self.is_staff:
+            return 'staff'
+        return self.user_type
 
 class Profile(models.Model):
     """
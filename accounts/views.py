@@ -171,7 +171,7 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
     """ViewSet pour gérer les abonnements des propriétaires."""
     
     serializer_class = OwnerSubscriptionSerializer
-    permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    permission_classes = [IsOwnerRole, IsOwnerOrReadOnly]
     
     def get_queryset(self):
         """Filtre les abonnements pour ne montrer que ceux de l'utilisateur actuel."""
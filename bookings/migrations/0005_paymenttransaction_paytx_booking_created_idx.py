@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-16 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_allow_null_tenant_for_external_bookings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymenttransaction',
+            index=models.Index(fields=['booking', '-created_at'], name='paytx_booking_created_idx'),
+        ),
+    ]
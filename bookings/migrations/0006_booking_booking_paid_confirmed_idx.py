@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-16 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_paymenttransaction_paytx_booking_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('payment_status', 'paid'), ('status', 'confirmed')), fields=['property', 'tenant'], name='booking_paid_confirmed_idx'),
+        ),
+    ]
@@ -5,12 +5,17 @@ import uuid
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from properties.models import Property, Availability
 
 User = get_user_model()
 
+# Mémoïsation des recherches de codes promo (validation à chaque saisie côté client)
+PROMO_CODE_CACHE_TIMEOUT = 300
+PROMO_CODE_CACHE_MISS = 'MISS'
+
 class PromoCode(models.Model):
     """
     Modèle pour les codes promotionnels qui peuvent être appliqués aux réservations.
@@ -44,23 +49,61 @@ class PromoCode(models.Model):
         """Vérifie si le code promo est valide."""
         return self.is_active and timezone.now() < self.expiry_date
     
+    @staticmethod
+    def get_cache_key(code, property_id):
+        """Clé de cache d'un code promo pour un logement."""
+        return f"promo:{property_id}:{code}"
+    
+    @staticmethod
+    def get_serialized_cache_key(pk):
+        """Clé de cache de la représentation sérialisée d'un code promo."""
+        return f"promo:serialized:{pk}"
+    
+    @classmethod
+    def get_cached(cls, code, property_id):
+        """
+        Récupère un code promo pour un logement en passant par le cache.
+        Les codes inexistants sont également mémorisés (valeur sentinelle).
+        L'activation et l'expiration doivent être revérifiées par l'appelant.
+        
+        Returns:
+            PromoCode: Le code promo (avec son logement) ou None
+        """
+        try:
+            property_id = uuid.UUID(str(property_id))
+        except ValueError:
+            return None
+        
+        def load():
+            promo_code = cls.objects.select_related('property').filter(
+                code=code,
+                property_id=property_id
+            ).first()
+            return promo_code or PROMO_CODE_CACHE_MISS
+        
+        promo_code = cache.get_or_set(cls.get_cache_key(code, property_id), load, PROMO_CODE_CACHE_TIMEOUT)
+        return None if promo_code == PROMO_CODE_CACHE_MISS else promo_code
+    
     def mark_as_used(self):
         """Marque le code promo comme utilisé (désactivé)."""
         self.is_active = False
         self.save(update_fields=['is_active'])
     
     def is_valid_for_user(self, user):
-        """Vérifie si le code promo est valide pour un utilisateur donné."""
+        """
+        Vérifie si le code promo est valide pour un utilisateur donné.
+        Compare uniquement les clés étrangères : aucune requête supplémentaire.
+        """
         # Le code n'est pas valide pour le propriétaire du logement
-        if user == self.property.owner:
+        if user.pk == self.property.owner_id:
             return False
         
         # Si pas de tenant spécifié, valide pour tous (sauf propriétaire)
-        if not self.tenant:
+        if not self.tenant_id:
             return True
         
         # Si tenant spécifié, valide seulement pour ce tenant
-        return self.tenant == user
+        return self.tenant_id == user.pk
 
 class Booking(models.Model):
     """
@@ -124,6 +167,14 @@ class Booking(models.Model):
         verbose_name_plural = _('réservations')
         ordering = ['-created_at']
         db_table = 'findam_bookings'
+        indexes = [
+            # Réservations confirmées et payées d'un logement (révélation des contacts)
+            models.Index(
+                fields=['property', 'tenant'],
+                condition=models.Q(status='confirmed', payment_status='paid'),
+                name='booking_paid_confirmed_idx'
+            ),
+        ]
     
     def __init__(self, *args, **kwargs):
         """Initialisation avec capture de l'état initial pour détecter les changements."""
@@ -348,10 +399,19 @@ class PaymentTransaction(models.Model):
         verbose_name_plural = _('transactions de paiement')
         ordering = ['-created_at']
         db_table = 'findam_payment_transactions'
+        indexes = [
+            # Dernière transaction d'une réservation (check_payment_status, escrow)
+            models.Index(fields=['booking', '-created_at'], name='paytx_booking_created_idx'),
+        ]
         
     def __str__(self):
         return f"Paiement de {self.amount} pour réservation {self.booking.id} ({self.get_status_display()})"
     
+    @staticmethod
+    def get_idempotency_index_key(pk):
+        """Clé de cache désignant la réponse d'initialisation dédupliquée d'une transaction."""
+        return f"pay:idem:tx:{pk}"
+    
     def save(self, *args, **kwargs):
         """Surcharge de la méthode save pour mettre à jour le statut de paiement de la réservation."""
         super().save(*args, **kwargs)
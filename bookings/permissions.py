@@ -6,19 +6,43 @@ from rest_framework import permissions
 class IsBookingParticipant(permissions.BasePermission):
     """
     Permission pour vérifier que l'utilisateur participe à la réservation.
+    Les comparaisons portent sur les clés étrangères pour ne charger ni le
+    locataire ni le propriétaire.
     """
+    message = "Vous n'êtes pas autorisé à accéder à cette réservation."
+    
     def has_object_permission(self, request, view, obj):
+        if request.user.is_staff:
+            return True
+        
         # Pour les réservations externes, seul le propriétaire peut y accéder
         if obj.is_external:
-            return request.user == obj.property.owner
+            return obj.property.owner_id == request.user.id
         
         # Pour les réservations normales
         return (
-            request.user == obj.tenant or 
-            request.user == obj.property.owner or
-            request.user.is_staff
+            obj.tenant_id == request.user.id or
+            obj.property.owner_id == request.user.id
         )
 
+class IsBookingPropertyOwner(permissions.BasePermission):
+    """
+    Permission réservée au propriétaire du logement réservé (ou aux administrateurs).
+    """
+    message = "Seuls les propriétaires du logement ou les administrateurs peuvent effectuer cette action."
+    
+    def has_object_permission(self, request, view, obj):
+        return request.user.is_staff or obj.property.owner_id == request.user.id
+
+class IsBookingTenant(permissions.BasePermission):
+    """
+    Permission réservée au locataire de la réservation.
+    """
+    message = "Seul le locataire peut effectuer cette action sur la réservation."
+    
+    def has_object_permission(self, request, view, obj):
+        return obj.tenant_id == request.user.id
+
 class IsPromoCodeOwnerOrReadOnly(permissions.BasePermission):
     """
     Permission qui autorise uniquement le propriétaire d'un code promo à le modifier.
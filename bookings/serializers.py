@@ -6,6 +6,7 @@ from django.utils import timezone
 from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from .models import Booking, PromoCode, BookingReview, PaymentTransaction
+from .services.cancellation_service import CancellationService
 from properties.models import Property, Availability
 from properties.serializers import PropertyListSerializer
 from accounts.serializers import UserSerializer
@@ -279,7 +280,32 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         return booking
 
 
-class BookingListSerializer(serializers.ModelSerializer):
+class OwnerCompensationMixin(serializers.Serializer):
+    """
+    Ajoute la compensation propriétaire aux réservations annulées,
+    uniquement si le contexte contient include_compensation.
+    """
+    
+    owner_compensation = serializers.SerializerMethodField()
+    
+    def get_fields(self):
+        """Retire la compensation propriétaire si elle n'a pas été demandée."""
+        fields = super().get_fields()
+        if not self.context.get('include_compensation'):
+            fields.pop('owner_compensation', None)
+        return fields
+    
+    def get_owner_compensation(self, obj):
+        """Calcule la compensation du propriétaire pour une réservation annulée."""
+        refund_amount, refund_percentage = CancellationService.calculate_refund_amount(obj)
+        owner_compensation = CancellationService.calculate_owner_compensation(obj, refund_percentage)
+        
+        return {
+            'amount': float(owner_compensation),
+            'percentage': float((1 - refund_percentage) * 100)
+        }
+
+class BookingListSerializer(OwnerCompensationMixin, serializers.ModelSerializer):
     """Sérialiseur pour la liste des réservations (version allégée)."""
     
     property_title = serializers.CharField(source='property.title', read_only=True)
@@ -299,7 +325,7 @@ class BookingListSerializer(serializers.ModelSerializer):
             'check_in_date', 'check_out_date', 'guests_count',
             'total_price', 'status', 'payment_status',
             'owner_name', 'tenant_name', 'tenant_details', 'created_at',
-            'is_external', 'external_client_name'
+            'is_external', 'external_client_name', 'owner_compensation'
         ]
     
     def get_tenant_name(self, obj):
@@ -331,7 +357,7 @@ class BookingListSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(main_image.image.url)
         return None
 
-class BookingDetailSerializer(serializers.ModelSerializer):
+class BookingDetailSerializer(OwnerCompensationMixin, serializers.ModelSerializer):
     """Sérialiseur pour les détails d'une réservation."""
     
     property = PropertyListSerializer(read_only=True)
@@ -351,7 +377,7 @@ class BookingDetailSerializer(serializers.ModelSerializer):
             'promo_code_details', 'status', 'payment_status',
             'special_requests', 'notes', 'review',
             'created_at', 'updated_at', 'cancelled_at',
-            'is_external', 'external_details'
+            'is_external', 'external_details', 'owner_compensation'
         ]
     
     def get_tenant(self, obj):
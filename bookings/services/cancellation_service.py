@@ -63,6 +63,13 @@ class CancellationService:
         
         try:
             with transaction.atomic():
+                # 0. Verrouiller la réservation : deux annulations simultanées
+                # ne doivent pas déclencher deux remboursements
+                if not Booking.objects.select_for_update().filter(
+                    pk=booking.pk
+                ).exclude(status__in=['cancelled', 'completed']).exists():
+                    raise ValueError(_("Cette réservation ne peut pas être annulée car elle est déjà terminée ou annulée."))
+                
                 # 1. Calculer le montant à rembourser
                 refund_amount, refund_percentage = cls.calculate_refund_amount(booking)
                 
@@ -452,9 +459,12 @@ class CancellationService:
         # Base de calcul pour la compensation (hors frais de service)
         base_amount = booking.base_price
         
-        # Récupérer le taux de commission propriétaire
+        # Récupérer le taux de commission propriétaire (éventuellement déjà chargée via select_related)
         from payments.models import Commission
-        commission = Commission.objects.filter(booking=booking).first()
+        try:
+            commission = booking.commission
+        except Commission.DoesNotExist:
+            commission = None
         if not commission:
             commission = Commission.calculate_for_booking(booking)
         
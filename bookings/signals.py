@@ -2,10 +2,11 @@
 # Gestionnaires de signaux pour automatiser les versements lors des changements de statut de réservation
 
 import logging
-from django.db.models.signals import post_save, pre_delete
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import Booking, PaymentTransaction
+from .models import Booking, PaymentTransaction, PromoCode
 from properties.models import Availability
 
 
@@ -165,6 +166,30 @@ def cleanup_availability_on_booking_delete(sender, instance, **kwargs):
     """Supprime les objets Availability lorsqu'une réservation est supprimée"""
     Availability.objects.filter(booking_id=instance.id).delete()
 
+@receiver(post_save, sender=PaymentTransaction)
+def release_payment_idempotency(sender, instance, created, **kwargs):
+    """
+    Libère la réponse d'initialisation dédupliquée d'une transaction qui quitte
+    'processing' (callback, vérification du statut) : un nouvel essai après un
+    refus de NotchPay crée un nouveau paiement au lieu de renvoyer l'ancien.
+    """
+    if created or instance.status in ('pending', 'processing'):
+        return
+    
+    index_key = PaymentTransaction.get_idempotency_index_key(instance.pk)
+    idempotency_cache_key = cache.get(index_key)
+    if idempotency_cache_key:
+        cache.delete_many([idempotency_cache_key, index_key])
+
+@receiver(post_save, sender=PromoCode)
+@receiver(post_delete, sender=PromoCode)
+def invalidate_promo_code_cache(sender, instance, **kwargs):
+    """Invalide les caches de validation d'un code promo modifié ou supprimé."""
+    cache.delete_many([
+        PromoCode.get_cache_key(instance.code, instance.property_id),
+        PromoCode.get_serialized_cache_key(instance.pk),
+    ])
+
 # Classes de support pour la détection des changements de statut
 class BookingStatusMiddleware:
     """
@@ -1,16 +1,34 @@
 # bookings/views.py
 # Vues pour la gestion des réservations
 
+import hashlib
+import requests
 from rest_framework import viewsets, permissions, status, filters
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import gettext as _
-from datetime import datetime
+from datetime import datetime, timedelta
+from io import BytesIO
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db import transaction
 from django.db.models import Q
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.loader import get_template
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
+from xhtml2pdf import pisa
 from .models import Booking, PromoCode, BookingReview, PaymentTransaction
+from .services.cancellation_service import CancellationService
 from common.permissions import IsOwnerRole, IsTenantRole
+from properties.models import Property
+from payments.models import Payout, Transaction
+from payments.services.notchpay_service import NotchPayService
+from payments.services.payout_service import PayoutService
+from payments.tasks import process_ready_payouts
+from payments.utils import NotchPayUtils, PaymentStatus
 from .serializers import (
     BookingCreateSerializer,
     BookingListSerializer,
@@ -22,6 +40,8 @@ from .serializers import (
 )
 from .permissions import (
     IsBookingParticipant,
+    IsBookingPropertyOwner,
+    IsBookingTenant,
     IsPromoCodeOwnerOrReadOnly,
     CanLeaveReview
 )
@@ -30,6 +50,37 @@ import logging
 
 logger = logging.getLogger('findam')
 
+# Durée (secondes) du verrou empêchant deux déclenchements simultanés d'un versement
+PAYOUT_LOCK_TIMEOUT = 30
+
+# Durée (secondes) de mise en cache de la représentation d'un code promo validé
+PROMO_CODE_SERIALIZED_CACHE_TIMEOUT = 600
+
+# Déduplication des initialisations de paiement : durée de conservation de la
+# réponse (libérée dès que la transaction quitte 'processing', voir
+# bookings.signals) et durée maximale d'un appel en cours
+PAYMENT_IDEMPOTENCY_TIMEOUT = 600
+PAYMENT_IN_FLIGHT_TIMEOUT = 60
+PAYMENT_IN_FLIGHT = 'in-flight'
+
+# Template du reçu PDF, compilé une seule fois par processus
+_RECEIPT_TEMPLATE = None
+
+def _get_receipt_template():
+    """Retourne le template du reçu, en le compilant au premier appel."""
+    global _RECEIPT_TEMPLATE
+    if _RECEIPT_TEMPLATE is None:
+        _RECEIPT_TEMPLATE = get_template('bookings/receipt_template.html')
+    return _RECEIPT_TEMPLATE
+
+def _get_serialized_promo_code(promo_code):
+    """Retourne la représentation d'un code promo, sérialisée une fois puis mise en cache."""
+    return cache.get_or_set(
+        PromoCode.get_serialized_cache_key(promo_code.pk),
+        lambda: PromoCodeSerializer(promo_code).data,
+        PROMO_CODE_SERIALIZED_CACHE_TIMEOUT
+    )
+
 class BookingViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour gérer les réservations.
@@ -40,6 +91,27 @@ class BookingViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'check_in_date', 'total_price']
     ordering = ['-created_at']
     
+    # Actions liées au paiement dont les réponses ne doivent jamais être mises en cache
+    NO_STORE_ACTIONS = frozenset([
+        'initiate_payment', 'check_payment_status', 'payment_callback',
+        'payment_status_escrow', 'complete_booking_and_release_funds',
+        'immediate_release', 'download_receipt',
+    ])
+    
+    # Champs suffisants pour les actions de changement de statut et de paiement,
+    # y compris ceux relus par Booking.save()
+    SLIM_BOOKING_FIELDS = (
+        'id', 'status', 'payment_status', 'is_external', 'total_price',
+        'check_in_date', 'check_out_date', 'tenant', 'property__owner',
+    )
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Interdit la mise en cache (proxy, CDN) des réponses de paiement."""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'action', None) in self.NO_STORE_ACTIONS:
+            patch_cache_control(response, private=True, no_store=True)
+        return response
+    
     def get_serializer_class(self):
         """
         Retourne la classe de sérialiseur appropriée selon l'action.
@@ -51,55 +123,19 @@ class BookingViewSet(viewsets.ModelViewSet):
         else:
             return BookingDetailSerializer
     
-    def get_queryset(self):
-        """
-        Retourne le queryset approprié selon le contexte.
-        - Pour les propriétaires : uniquement les réservations de leurs logements
-        - Pour les locataires : uniquement leurs réservations
-        - Pour les administrateurs : toutes les réservations
-        """
-        user = self.request.user
-        
-        # Vérifier si c'est une requête pour l'espace propriétaire
-        is_owner_request = self.request.path.startswith('/api/v1/bookings/') and (
-            self.request.GET.get('is_owner') == 'true' or 
-            'owner' in self.request.path
-        )
-        
-        if user.is_staff:
-            return Booking.objects.all().select_related(
-                'property', 'tenant', 'property__city', 'property__neighborhood'
-            ).prefetch_related('property__images')
-        
-        # Si l'utilisateur est un propriétaire ET que c'est une requête pour l'espace propriétaire
-        if user.user_type == 'owner' and is_owner_request:
-            return Booking.objects.filter(property__owner=user).select_related(
-                'property', 'tenant', 'property__city', 'property__neighborhood'  
-            ).prefetch_related('property__images')
-        
-        # Si l'utilisateur est un propriétaire mais accède aux routes de locataire
-        # On retourne ses propres réservations en tant que locataire
-        if user.user_type == 'owner' and not is_owner_request:
-            return Booking.objects.filter(tenant=user).select_related(
-                'property', 'property__city', 'property__neighborhood'
-            ).prefetch_related('property__images')
-        
-        # Par défaut, retourner les réservations du locataire
-        return Booking.objects.filter(tenant=user).select_related(
-            'property', 'property__city', 'property__neighborhood'
-        ).prefetch_related('property__images')
-    
     def get_permissions(self):
         """
         Permissions basées sur les rôles pour les réservations.
         """
-        if self.action in ['create', 'initiate_payment', 'check_payment_status']:
+        if self.action in ['create', 'check_payment_status']:
             permission_classes = [IsTenantRole]
+        elif self.action in ['initiate_payment']:
+            permission_classes = [IsTenantRole, IsBookingTenant]
         elif self.action in ['confirm', 'complete', 'complete_booking_and_release_funds']:
-            permission_classes = [IsOwnerRole]
+            permission_classes = [IsOwnerRole, IsBookingPropertyOwner]
         elif self.action in ['immediate_release']:
             permission_classes = [permissions.IsAdminUser]
-        elif self.action in ['cancel']:
+        elif self.action in ['cancel', 'payment_status_escrow', 'download_receipt']:
             permission_classes = [permissions.IsAuthenticated, IsBookingParticipant]
         elif self.action in ['cancelled_with_compensation']:
             permission_classes = [IsOwnerRole]
@@ -110,6 +146,24 @@ class BookingViewSet(viewsets.ModelViewSet):
         
         return [permission() for permission in permission_classes]
     
+    def _get_slim_booking(self, *extra_fields, lock=False):
+        """
+        Récupère la réservation de l'URL en ne chargeant que SLIM_BOOKING_FIELDS
+        (et les champs supplémentaires demandés), sans les images du logement.
+        Le périmètre (get_queryset) et les permissions objet restent appliqués.
+        Avec lock=True, la ligne de la réservation est verrouillée (à appeler
+        dans une transaction) : les vérifications de statut qui suivent
+        portent sur l'état verrouillé.
+        """
+        queryset = self.get_queryset().select_related(None).prefetch_related(None)
+        queryset = queryset.select_related('property').only(*self.SLIM_BOOKING_FIELDS, *extra_fields)
+        if lock:
+            queryset = queryset.select_for_update(of=('self',))
+        
+        booking = get_object_or_404(queryset, pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, booking)
+        return booking
+    
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -127,8 +181,6 @@ class BookingViewSet(viewsets.ModelViewSet):
         Annule une réservation et gère le remboursement selon la politique applicable.
         POST /api/v1/bookings/{id}/cancel/
         """
-        from .services.cancellation_service import CancellationService
-        
         booking = self.get_object()
         
         # Récupérer la raison (optionnelle)
@@ -164,29 +216,25 @@ class BookingViewSet(viewsets.ModelViewSet):
         Confirme une réservation (pour les propriétaires ou administrateurs).
         POST /api/v1/bookings/{id}/confirm/
         """
-        booking = self.get_object()
-        
-        # Vérifier que l'utilisateur est le propriétaire ou un administrateur
-        if not (request.user.is_staff or request.user == booking.property.owner):
-            return Response({
-                "detail": _("Seuls les propriétaires ou administrateurs peuvent confirmer une réservation.")
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        # Vérifier que la réservation est en attente
-        if booking.status != 'pending':
-            return Response({
-                "detail": _("Seules les réservations en attente peuvent être confirmées.")
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Vérifier que le paiement est effectué
-        if booking.payment_status != 'paid':
-            return Response({
-                "detail": _("La réservation ne peut être confirmée que si le paiement est effectué.")
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Confirmer la réservation
-        booking.status = 'confirmed'
-        booking.save(update_fields=['status'])
+        with transaction.atomic():
+            # Lecture verrouillée : une confirmation concurrente attend et voit le nouveau statut
+            booking = self._get_slim_booking(lock=True)
+            
+            # Vérifier que la réservation est en attente
+            if booking.status != 'pending':
+                return Response({
+                    "detail": _("Seules les réservations en attente peuvent être confirmées.")
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Vérifier que le paiement est effectué
+            if booking.payment_status != 'paid':
+                return Response({
+                    "detail": _("La réservation ne peut être confirmée que si le paiement est effectué.")
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Confirmer la réservation (save() : disponibilités et signal de versement)
+            booking.status = 'confirmed'
+            booking.save(update_fields=['status'])
         
         return Response({
             "detail": _("Réservation confirmée avec succès.")
@@ -198,29 +246,25 @@ class BookingViewSet(viewsets.ModelViewSet):
         Marque une réservation comme terminée (pour les propriétaires ou administrateurs).
         POST /api/v1/bookings/{id}/complete/
         """
-        booking = self.get_object()
-        
-        # Vérifier que l'utilisateur est le propriétaire ou un administrateur
-        if not (request.user.is_staff or request.user == booking.property.owner):
-            return Response({
-                "detail": _("Seuls les propriétaires ou administrateurs peuvent marquer une réservation comme terminée.")
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        # Vérifier que la réservation est confirmée
-        if booking.status != 'confirmed':
-            return Response({
-                "detail": _("Seules les réservations confirmées peuvent être marquées comme terminées.")
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Vérifier que la date de départ est passée
-        if booking.check_out_date > timezone.now().date():
-            return Response({
-                "detail": _("La réservation ne peut être marquée comme terminée qu'après la date de départ.")
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Marquer la réservation comme terminée
-        booking.status = 'completed'
-        booking.save(update_fields=['status'])
+        with transaction.atomic():
+            # Lecture verrouillée : les vérifications portent sur le statut à jour
+            booking = self._get_slim_booking(lock=True)
+            
+            # Vérifier que la réservation est confirmée
+            if booking.status != 'confirmed':
+                return Response({
+                    "detail": _("Seules les réservations confirmées peuvent être marquées comme terminées.")
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Vérifier que la date de départ est passée
+            if booking.check_out_date > timezone.now().date():
+                return Response({
+                    "detail": _("La réservation ne peut être marquée comme terminée qu'après la date de départ.")
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Marquer la réservation comme terminée (save() : signal de versement)
+            booking.status = 'completed'
+            booking.save(update_fields=['status'])
         
         return Response({
             "detail": _("Réservation marquée comme terminée avec succès.")
@@ -255,11 +299,9 @@ class BookingViewSet(viewsets.ModelViewSet):
         
         try:
             # Vérifier que la propriété appartient au propriétaire
-            from properties.models import Property
             property_obj = Property.objects.get(id=property_id, owner=request.user)
             
             # Convertir les dates
-            from datetime import datetime
             check_in_date = datetime.strptime(check_in_date, '%Y-%m-%d').date()
             check_out_date = datetime.strptime(check_out_date, '%Y-%m-%d').date()
             
@@ -339,17 +381,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         Initie le paiement d'une réservation.
         POST /api/v1/bookings/{id}/initiate_payment/
         """
-        from payments.services.notchpay_service import NotchPayService
-        from payments.utils import NotchPayUtils
-        from django.conf import settings
-        
-        booking = self.get_object()
-        
-        # Vérifier que l'utilisateur est le locataire
-        if request.user != booking.tenant:
-            return Response({
-                "detail": _("Seul le locataire peut payer une réservation.")
-            }, status=status.HTTP_403_FORBIDDEN)
+        booking = self._get_slim_booking('property__title')
         
         # Vérifier que la réservation est en attente
         if booking.status != 'pending':
@@ -374,35 +406,57 @@ class BookingViewSet(viewsets.ModelViewSet):
         phone_number = request.data.get('phone_number', '')
         formatted_phone = NotchPayUtils.format_phone_number(phone_number) if phone_number else NotchPayUtils.format_phone_number(request.user.phone_number)
         
-        # Créer une transaction de paiement
-        transaction = PaymentTransaction.objects.create(
-            booking=booking,
-            amount=booking.total_price,
-            payment_method=payment_method,
-            status='pending'
-        )
-        
-        # Préparer les métadonnées pour NotchPay
-        metadata = {
-            'transaction_type': 'booking',
-            'object_id': str(booking.id),
-            'transaction_id': str(transaction.id)
-        }
-        
-        # Préparer les informations client
-        customer_info = {
-            'email': booking.tenant.email,
-            'phone': formatted_phone,
-            'name': f"{booking.tenant.first_name} {booking.tenant.last_name}"
-        }
-        
-        # Préparation de la description
-        description = f"Réservation {booking.id} - {booking.property.title} du {booking.check_in_date} au {booking.check_out_date}"
+        # Dédupliquer les doubles soumissions : une même clé renvoie la réponse déjà obtenue.
+        # Sans en-tête Idempotency-Key, seule une demande identique (méthode, opérateur,
+        # numéro) est dédupliquée : changer de numéro ou d'opérateur crée un nouveau paiement
+        idempotency_key = request.headers.get('Idempotency-Key') or f"{payment_method}:{mobile_operator}:{formatted_phone}"
+        idempotency_cache_key = 'pay:idem:' + hashlib.sha1(
+            f"{booking.id}:{request.user.id}:{idempotency_key}".encode('utf-8')
+        ).hexdigest()
+        if not cache.add(idempotency_cache_key, PAYMENT_IN_FLIGHT, timeout=PAYMENT_IN_FLIGHT_TIMEOUT):
+            cached_response = cache.get(idempotency_cache_key)
+            if cached_response == PAYMENT_IN_FLIGHT:
+                return Response({
+                    "detail": _("Un paiement est déjà en cours d'initialisation pour cette réservation.")
+                }, status=status.HTTP_409_CONFLICT)
+            if cached_response is not None:
+                return Response(cached_response)
         
-        # URLs de redirection
-        callback_url = f"{settings.PAYMENT_CALLBACK_BASE_URL}/api/v1/payments/webhook/notchpay/"
-        success_url = f"{settings.FRONTEND_URL}/bookings/{booking.id}?payment_status=success"
-        cancel_url = f"{settings.FRONTEND_URL}/bookings/{booking.id}?payment_status=cancel"
+        try:
+            # Créer une transaction de paiement
+            transaction = PaymentTransaction.objects.create(
+                booking=booking,
+                amount=booking.total_price,
+                payment_method=payment_method,
+                status='pending'
+            )
+            
+            # Préparer les métadonnées pour NotchPay
+            metadata = {
+                'transaction_type': 'booking',
+                'object_id': str(booking.id),
+                'transaction_id': str(transaction.id)
+            }
+            
+            # Préparer les informations client
+            customer_info = {
+                'email': booking.tenant.email,
+                'phone': formatted_phone,
+                'name': f"{booking.tenant.first_name} {booking.tenant.last_name}"
+            }
+            
+            # Préparation de la description
+            description = f"Réservation {booking.id} - {booking.property.title} du {booking.check_in_date} au {booking.check_out_date}"
+            
+            # URLs de redirection
+            callback_url = f"{settings.PAYMENT_CALLBACK_BASE_URL}/api/v1/payments/webhook/notchpay/"
+            success_url = f"{settings.FRONTEND_URL}/bookings/{booking.id}?payment_status=success"
+            cancel_url = f"{settings.FRONTEND_URL}/bookings/{booking.id}?payment_status=cancel"
+        except Exception:
+            # Échec avant l'appel à NotchPay : libérer le marqueur "en cours"
+            # pour que l'utilisateur puisse réessayer immédiatement
+            cache.delete(idempotency_cache_key)
+            raise
         
         try:
             # Initialiser le service NotchPay
@@ -438,25 +492,44 @@ class BookingViewSet(viewsets.ModelViewSet):
                 transaction.save()
                 
                 # Retourner l'URL de paiement au client
-                return Response({
+                response_data = {
                     "payment_url": payment_result.get('authorization_url', ''),
                     "transaction_id": str(transaction.id),
                     "notchpay_reference": notchpay_reference
-                })
+                }
+                cache.set_many({
+                    idempotency_cache_key: response_data,
+                    # Permet de libérer la réponse lorsque la transaction aboutit ou échoue
+                    PaymentTransaction.get_idempotency_index_key(transaction.id): idempotency_cache_key,
+                }, timeout=PAYMENT_IDEMPOTENCY_TIMEOUT)
+                return Response(response_data)
             else:
                 transaction.status = 'failed'
                 transaction.payment_response = {'error': 'Réponse NotchPay invalide'}
                 transaction.save()
+                cache.delete(idempotency_cache_key)
                 
                 return Response({
                     "detail": _("Échec de l'initialisation du paiement."),
                     "error": "Réponse invalide du service de paiement"
                 }, status=status.HTTP_400_BAD_REQUEST)
+        
+        except requests.Timeout as e:
+            transaction.status = 'failed'
+            transaction.payment_response = {"error": "timeout", "detail": str(e)}
+            transaction.save()
+            cache.delete(idempotency_cache_key)
+            
+            return Response({
+                "detail": _("Le service de paiement ne répond pas. Veuillez réessayer."),
+                "error": str(e)
+            }, status=status.HTTP_504_GATEWAY_TIMEOUT)
                     
         except Exception as e:
             transaction.status = 'failed'
             transaction.payment_response = {"error": str(e)}
             transaction.save()
+            cache.delete(idempotency_cache_key)
             
             return Response({
                 "detail": _("Une erreur est survenue lors de l'initialisation du paiement."),
@@ -469,14 +542,8 @@ class BookingViewSet(viewsets.ModelViewSet):
         Vérifie le statut d'un paiement.
         GET /api/v1/bookings/{id}/check_payment_status/
         """
-        from payments.services.notchpay_service import NotchPayService
-        from payments.utils import NotchPayUtils, PaymentStatus
-        import logging
-        
-        logger = logging.getLogger('findam')
-        
         try:
-            booking = self.get_object()
+            booking = self._get_slim_booking()
             logger.info(f"Vérification du statut de paiement pour la réservation {booking.id}")
             
             # Récupérer la dernière transaction
@@ -568,12 +635,6 @@ class BookingViewSet(viewsets.ModelViewSet):
         Callback pour NotchPay.
         POST /api/v1/bookings/payment_callback/
         """
-        import hmac
-        import hashlib
-        from django.conf import settings
-        from payments.services.notchpay_service import NotchPayService
-        from payments.utils import NotchPayUtils, PaymentStatus
-        
         # Vérifier la signature de la requête pour sécuriser le callback
         signature = request.headers.get('X-Notch-Signature', '')
         payload = request.body
@@ -582,7 +643,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         notchpay_service = NotchPayService()
         
         # Vérifier la signature
-        if signature and not notchpay_service.verify_webhook_signature(payload.decode('utf-8'), signature):
+        if signature and not notchpay_service.verify_webhook_signature(payload, signature):
             return Response({
                 "detail": _("Signature non valide.")
             }, status=status.HTTP_403_FORBIDDEN)
@@ -591,7 +652,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         data = request.data
         
         # Log les données reçues pour le débogage
-        self.logger.info(f"Callback de paiement reçu: {data}")
+        logger.info(f"Callback de paiement reçu: {data}")
         
         # Vérifier le statut du paiement
         payment_status = data.get('data', {}).get('status')
@@ -611,78 +672,104 @@ class BookingViewSet(viewsets.ModelViewSet):
             booking_id = metadata.get('object_id')
         
         try:
-            # Récupérer la transaction
-            transaction = None
+            # Identifier la transaction (clé et statut uniquement)
+            transaction_row = None
             
             # Essayer de trouver la transaction par référence externe
             if transaction_reference:
-                transaction = PaymentTransaction.objects.filter(
+                transaction_row = PaymentTransaction.objects.filter(
                     external_reference=transaction_reference
-                ).first()
+                ).values_list('pk', 'status').first()
             
             # Si pas trouvé et booking_id existe, chercher par booking_id
-            if not transaction and booking_id:
-                transaction = PaymentTransaction.objects.filter(
+            if not transaction_row and booking_id:
+                transaction_row = PaymentTransaction.objects.filter(
                     booking__id=booking_id
-                ).order_by('-created_at').first()
+                ).order_by('-created_at').values_list('pk', 'status').first()
             
             # Si aucune transaction n'est trouvée, journaliser et retourner une erreur
-            if not transaction:
-                self.logger.error(f"Transaction non trouvée pour la référence {transaction_reference} ou booking {booking_id}")
+            if not transaction_row:
+                logger.error(f"Transaction non trouvée pour la référence {transaction_reference} ou booking {booking_id}")
                 return Response({
                     "detail": _("Transaction non trouvée.")
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Mettre à jour la transaction avec les données de NotchPay
-            transaction.payment_response = data
+            transaction_pk, current_status = transaction_row
+            
+            # Rejeu d'un callback pour une transaction déjà payée : acquitter sans écriture.
+            # Une transaction 'failed' (ex. délai d'initialisation dépassé) peut encore
+            # recevoir un succès légitime : elle passe par la mise à jour verrouillée
+            if current_status == PaymentStatus.COMPLETED:
+                return Response({
+                    "detail": _("Callback déjà traité.")
+                })
             
             # Convertir le statut NotchPay en statut interne
             internal_status = NotchPayUtils.convert_notchpay_status(payment_status)
-            transaction.status = internal_status
-            transaction.save()
             
-            # Récupérer la réservation associée
-            booking = transaction.booking
-            
-            # Mettre à jour le statut de paiement de la réservation
-            if internal_status == PaymentStatus.COMPLETED:
-                booking.payment_status = 'paid'
-                booking.save(update_fields=['payment_status'])
+            with transaction.atomic():
+                # NotchPay rejoue ses callbacks : si un autre worker traite déjà cette
+                # transaction, ou si ce statut a déjà été appliqué, acquitter sans rien refaire
+                payment_transaction = PaymentTransaction.objects.select_for_update(
+                    skip_locked=True
+                ).select_related('booking').filter(pk=transaction_pk).first()
                 
-                # Créer une transaction financière
-                from payments.models import Transaction
-                Transaction.objects.create(
-                    user=booking.tenant,
-                    transaction_type='payment',
-                    status='completed',
-                    amount=booking.total_price,
-                    currency='XAF',
-                    booking=booking,
-                    payment_transaction=transaction,
-                    external_reference=transaction_reference,
-                    description=f"Paiement pour la réservation {booking.id}"
-                )
+                if payment_transaction is None:
+                    return Response({
+                        "detail": _("Callback déjà en cours de traitement.")
+                    })
                 
-                return Response({
-                    "detail": _("Paiement réussi.")
-                })
+                if payment_transaction.status == internal_status:
+                    return Response({
+                        "detail": _("Callback déjà traité.")
+                    })
                 
-            elif internal_status == PaymentStatus.FAILED:
-                booking.payment_status = 'failed'
-                booking.save(update_fields=['payment_status'])
+                # Mettre à jour la transaction avec les données de NotchPay
+                payment_transaction.payment_response = data
+                payment_transaction.status = internal_status
+                payment_transaction.save()
                 
-                return Response({
-                    "detail": _("Paiement échoué.")
-                })
+                # Récupérer la réservation associée
+                booking = payment_transaction.booking
                 
-            else:
-                # Pour les autres statuts (pending, processing...)
-                return Response({
-                    "detail": _("Paiement en cours de traitement.")
-                })
+                # Mettre à jour le statut de paiement de la réservation
+                if internal_status == PaymentStatus.COMPLETED:
+                    booking.payment_status = 'paid'
+                    booking.save(update_fields=['payment_status'])
+                    
+                    # Créer une transaction financière
+                    Transaction.objects.create(
+                        user=booking.tenant,
+                        transaction_type='payment',
+                        status='completed',
+                        amount=booking.total_price,
+                        currency='XAF',
+                        booking=booking,
+                        payment_transaction=payment_transaction,
+                        external_reference=transaction_reference,
+                        description=f"Paiement pour la réservation {booking.id}"
+                    )
+                    
+                    return Response({
+                        "detail": _("Paiement réussi.")
+                    })
+                    
+                elif internal_status == PaymentStatus.FAILED:
+                    booking.payment_status = 'failed'
+                    booking.save(update_fields=['payment_status'])
+                    
+                    return Response({
+                        "detail": _("Paiement échoué.")
+                    })
+                    
+                else:
+                    # Pour les autres statuts (pending, processing...)
+                    return Response({
+                        "detail": _("Paiement en cours de traitement.")
+                    })
                     
         except Exception as e:
-            self.logger.exception(f"Erreur lors du traitement du callback: {str(e)}")
+            logger.exception(f"Erreur lors du traitement du callback: {str(e)}")
             return Response({
                 "detail": _("Une erreur est survenue lors du traitement du paiement."),
                 "error": str(e)
@@ -694,20 +781,17 @@ class BookingViewSet(viewsets.ModelViewSet):
         Vérifie le statut du paiement et des versements programmés pour cette réservation.
         GET /api/v1/bookings/{id}/payment_status_escrow/
         """
-        booking = self.get_object()
+        # Endpoint interrogé en boucle : ne charger que les colonnes utiles
+        booking = self._get_slim_booking()
         
-        # Vérifier que l'utilisateur est autorisé (propriétaire, locataire ou admin)
-        if not (request.user.is_staff or request.user == booking.tenant or request.user == booking.property.owner):
-            return Response({
-                "detail": _("Vous n'êtes pas autorisé à accéder à ces informations.")
-            }, status=status.HTTP_403_FORBIDDEN)
+        is_tenant = booking.tenant_id == request.user.id
+        is_owner = booking.property.owner_id == request.user.id
         
         try:
             # Récupérer la dernière transaction de paiement
             payment_transaction = booking.transactions.order_by('-created_at').first()
             
             # Récupérer le versement programmé associé
-            from payments.models import Payout
             payout = Payout.objects.filter(
                 bookings__id=booking.id
             ).order_by('-created_at').first()
@@ -742,15 +826,15 @@ class BookingViewSet(viewsets.ModelViewSet):
                 })
             
             # Ajouter des informations spécifiques pour le propriétaire
-            if request.user == booking.property.owner:
+            if is_owner:
                 payment_info.update({
-                    "owner_message": _get_owner_escrow_message(booking, payout)
+                    "owner_message": self._get_owner_escrow_message(booking, payout)
                 })
             
             # Ajouter des informations spécifiques pour le locataire
-            if request.user == booking.tenant:
+            if is_tenant:
                 payment_info.update({
-                    "tenant_message": _get_tenant_escrow_message(booking, payout)
+                    "tenant_message": self._get_tenant_escrow_message(booking, payout)
                 })
             
             return Response(payment_info)
@@ -761,6 +845,7 @@ class BookingViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     # Fonctions d'assistance pour les messages aux utilisateurs
+    @staticmethod
     def _get_owner_escrow_message(booking, payout):
         """Génère un message explicatif sur le statut du versement pour le propriétaire."""
         if not payout:
@@ -794,6 +879,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         
         return _("Le statut de votre versement est actuellement en révision.")
 
+    @staticmethod
     def _get_tenant_escrow_message(booking, payout):
         """Génère un message explicatif sur le statut du paiement pour le locataire."""
         if booking.payment_status != 'paid':
@@ -830,12 +916,6 @@ class BookingViewSet(viewsets.ModelViewSet):
         """
         booking = self.get_object()
         
-        # Vérifier que l'utilisateur est autorisé (admin ou propriétaire)
-        if not (request.user.is_staff or request.user == booking.property.owner):
-            return Response({
-                "detail": _("Vous n'êtes pas autorisé à effectuer cette action.")
-            }, status=status.HTTP_403_FORBIDDEN)
-        
         # Vérifier que la réservation est confirmée
         if booking.status != 'confirmed':
             return Response({
@@ -848,30 +928,50 @@ class BookingViewSet(viewsets.ModelViewSet):
                 "detail": _("La réservation ne peut être marquée comme terminée que si le paiement est effectué.")
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Verrou court : une requête répétée pendant le traitement est rejetée
+        lock_key = f'payout-lock:{booking.id}'
+        if not cache.add(lock_key, '1', timeout=PAYOUT_LOCK_TIMEOUT):
+            return Response({
+                "detail": _("Un versement est déjà en cours de traitement pour cette réservation.")
+            }, status=status.HTTP_409_CONFLICT)
+        
         try:
-            # Marquer la réservation comme terminée
-            booking.status = 'completed'
-            booking.save(update_fields=['status'])
-            
-            # Récupérer ou créer un versement programmé si nécessaire
-            from payments.models import Payout
-            from payments.services.payout_service import PayoutService
-            
-            # Vérifier si un versement existe déjà
-            payout = Payout.objects.filter(
-                bookings__id=booking.id,
-                status__in=['pending', 'scheduled', 'ready', 'processing']
-            ).first()
-            
-            # Si pas de versement, en programmer un
-            if not payout:
-                payout = PayoutService.schedule_payout_for_booking(booking)
-            
-            # Si le versement est programmé, le marquer comme prêt
-            if payout and payout.status == 'scheduled':
-                payout.mark_as_ready()
-                payout.admin_notes += f"\nVersement marqué comme prêt suite à complétion de la réservation par {request.user.email}"
-                payout.save(update_fields=['admin_notes'])
+            with transaction.atomic():
+                # Verrouiller la réservation : une seconde requête concurrente
+                # abandonne au lieu d'attendre et de créer un doublon de versement
+                locked_booking = Booking.objects.select_for_update(skip_locked=True).filter(pk=booking.pk).first()
+                if locked_booking is None:
+                    return Response({
+                        "detail": _("Un versement est déjà en cours de traitement pour cette réservation.")
+                    }, status=status.HTTP_409_CONFLICT)
+                
+                # Revérifier le statut sur la ligne verrouillée
+                if locked_booking.status != 'confirmed':
+                    return Response({
+                        "detail": _("Seules les réservations confirmées peuvent être marquées comme terminées.")
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                
+                booking = locked_booking
+                
+                # Marquer la réservation comme terminée
+                booking.status = 'completed'
+                booking.save(update_fields=['status'])
+                
+                # Vérifier si un versement existe déjà
+                payout = Payout.objects.select_for_update().filter(
+                    bookings__id=booking.id,
+                    status__in=['pending', 'scheduled', 'ready', 'processing']
+                ).first()
+                
+                # Si pas de versement, en programmer un
+                if not payout:
+                    payout = PayoutService.schedule_payout_for_booking(booking)
+                
+                # Si le versement est programmé, le marquer comme prêt
+                if payout and payout.status == 'scheduled':
+                    payout.mark_as_ready()
+                    payout.admin_notes += f"\nVersement marqué comme prêt suite à complétion de la réservation par {request.user.email}"
+                    payout.save(update_fields=['admin_notes'])
             
             return Response({
                 "detail": _("Réservation marquée comme terminée et versement déclenché avec succès."),
@@ -884,6 +984,8 @@ class BookingViewSet(viewsets.ModelViewSet):
             return Response({
                 "detail": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        finally:
+            cache.delete(lock_key)
 
     @action(detail=True, methods=['post'])
     def immediate_release(self, request, pk=None):
@@ -893,12 +995,6 @@ class BookingViewSet(viewsets.ModelViewSet):
         """
         booking = self.get_object()
         
-        # Vérifier que l'utilisateur est un administrateur
-        if not request.user.is_staff:
-            return Response({
-                "detail": _("Seuls les administrateurs peuvent déclencher un versement immédiat.")
-            }, status=status.HTTP_403_FORBIDDEN)
-        
         # Vérifier que la réservation est confirmée ou terminée
         if booking.status not in ['confirmed', 'completed']:
             return Response({
@@ -911,32 +1007,45 @@ class BookingViewSet(viewsets.ModelViewSet):
                 "detail": _("Le versement ne peut être effectué que si le paiement est reçu.")
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Verrou court : une requête répétée pendant le traitement est rejetée
+        lock_key = f'payout-lock:{booking.id}'
+        if not cache.add(lock_key, '1', timeout=PAYOUT_LOCK_TIMEOUT):
+            return Response({
+                "detail": _("Un versement est déjà en cours de traitement pour cette réservation.")
+            }, status=status.HTTP_409_CONFLICT)
+        
         try:
-            # Récupérer les versements existants
-            from payments.models import Payout
-            
-            # Vérifier si un versement existe déjà
-            existing_payout = Payout.objects.filter(
-                bookings__id=booking.id,
-                status__in=['pending', 'scheduled', 'ready', 'processing']
-            ).first()
-            
-            if existing_payout:
-                # Si un versement existe, le marquer comme prêt
-                existing_payout.mark_as_ready()
-                existing_payout.admin_notes += f"\nVersement immédiat déclenché par admin {request.user.email}"
-                existing_payout.save(update_fields=['admin_notes'])
+            with transaction.atomic():
+                # Verrouiller la réservation pour éviter deux versements simultanés
+                locked_booking = Booking.objects.select_for_update(skip_locked=True).filter(pk=booking.pk).first()
+                if locked_booking is None:
+                    return Response({
+                        "detail": _("Un versement est déjà en cours de traitement pour cette réservation.")
+                    }, status=status.HTTP_409_CONFLICT)
                 
-                payout = existing_payout
-            else:
-                # Sinon, créer un nouveau versement immédiat
-                from payments.services.payout_service import PayoutService
-                payout = PayoutService.schedule_payout_for_booking(booking)
+                booking = locked_booking
                 
-                if payout:
-                    payout.mark_as_ready()
-                    payout.admin_notes += f"\nVersement immédiat créé par admin {request.user.email}"
-                    payout.save(update_fields=['admin_notes'])
+                # Vérifier si un versement existe déjà
+                existing_payout = Payout.objects.select_for_update().filter(
+                    bookings__id=booking.id,
+                    status__in=['pending', 'scheduled', 'ready', 'processing']
+                ).first()
+                
+                if existing_payout:
+                    # Si un versement existe, le marquer comme prêt
+                    existing_payout.mark_as_ready()
+                    existing_payout.admin_notes += f"\nVersement immédiat déclenché par admin {request.user.email}"
+                    existing_payout.save(update_fields=['admin_notes'])
+                    
+                    payout = existing_payout
+                else:
+                    # Sinon, créer un nouveau versement immédiat
+                    payout = PayoutService.schedule_payout_for_booking(booking)
+                    
+                    if payout:
+                        payout.mark_as_ready()
+                        payout.admin_notes += f"\nVersement immédiat créé par admin {request.user.email}"
+                        payout.save(update_fields=['admin_notes'])
             
             if not payout:
                 return Response({
@@ -944,7 +1053,6 @@ class BookingViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Traiter immédiatement le versement (optionnel)
-            from payments.tasks import process_ready_payouts
             process_ready_payouts()
             
             # Rafraîchir l'objet pour récupérer les dernières modifications
@@ -960,6 +1068,8 @@ class BookingViewSet(viewsets.ModelViewSet):
             return Response({
                 "detail": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        finally:
+            cache.delete(lock_key)
     
     @action(detail=False, methods=['get'])
     def cancelled_with_compensation(self, request):
@@ -967,48 +1077,15 @@ class BookingViewSet(viewsets.ModelViewSet):
         Récupère les réservations annulées avec les détails de compensation.
         GET /api/v1/bookings/bookings/cancelled_with_compensation/
         """
-        from .services.cancellation_service import CancellationService
-        
         # Vérifier que l'utilisateur est bien propriétaire
         if not request.user.is_owner and not request.user.is_staff:
             return Response({
                 "detail": _("Seuls les propriétaires peuvent accéder à ces informations.")
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Récupérer les réservations annulées
-        queryset = self.get_queryset().filter(status='cancelled')
-        
-        # Appliquer les filtres standards
-        queryset = self.filter_queryset(queryset)
-        
-        # Paginer les résultats
-        page = self.paginate_queryset(queryset)
-        
-        # Sérialiser les résultats de base
-        serializer = self.get_serializer(page, many=True)
-        
-        # Ajouter les informations de compensation
-        result_data = serializer.data
-        for booking_data in result_data:
-            # Récupérer l'objet réservation
-            booking_id = booking_data.get('id')
-            try:
-                booking = Booking.objects.get(id=booking_id)
-                
-                # Calculer la compensation
-                refund_amount, refund_percentage = CancellationService.calculate_refund_amount(booking)
-                owner_compensation = CancellationService.calculate_owner_compensation(booking, refund_percentage)
-                
-                # Ajouter aux données de sortie
-                booking_data['owner_compensation'] = {
-                    'amount': float(owner_compensation),
-                    'percentage': float((1 - refund_percentage) * 100)
-                }
-                
-            except Booking.DoesNotExist:
-                booking_data['owner_compensation'] = None
-        
-        return self.get_paginated_response(result_data)
+        # Le chemin standard de listing filtre, pagine et sérialise une seule fois
+        self.include_compensation = True
+        return super().list(request)
     
     def list(self, request, *args, **kwargs):
         """
@@ -1018,31 +1095,36 @@ class BookingViewSet(viewsets.ModelViewSet):
         include_compensation = request.query_params.get('include_compensation', 'false').lower() == 'true'
         
         if include_compensation and (request.user.is_owner or request.user.is_staff):
-            # Utiliser l'action spéciale pour les compensations
-            return self.cancelled_with_compensation(request)
+            self.include_compensation = True
         
-        # Sinon, comportement standard
         return super().list(request, *args, **kwargs)
     
+    def filter_queryset(self, queryset):
+        """
+        Restreint aux réservations annulées et précharge la commission
+        lorsque les compensations sont demandées.
+        """
+        queryset = super().filter_queryset(queryset)
+        
+        if getattr(self, 'include_compensation', False):
+            queryset = queryset.filter(status='cancelled').select_related('commission')
+        
+        return queryset
+    
+    def get_serializer_context(self):
+        """Ajoute le drapeau de compensation au contexte du sérialiseur."""
+        context = super().get_serializer_context()
+        context['include_compensation'] = getattr(self, 'include_compensation', False)
+        return context
+    
     @action(detail=True, methods=['get'])
     def download_receipt(self, request, pk=None):
         """
         Génère et télécharge la facture/reçu d'une réservation au format PDF.
         GET /api/v1/bookings/{id}/download_receipt/
         """
-        from django.http import HttpResponse
-        from django.template.loader import get_template
-        from xhtml2pdf import pisa
-        from io import BytesIO
-        
         booking = self.get_object()
         
-        # Vérifier que l'utilisateur est autorisé (propriétaire, locataire ou admin)
-        if not (request.user.is_staff or request.user == booking.tenant or request.user == booking.property.owner):
-            return Response({
-                "detail": _("Vous n'êtes pas autorisé à télécharger cette facture.")
-            }, status=status.HTTP_403_FORBIDDEN)
-        
         # Vérifier que la réservation est payée
         if booking.payment_status != 'paid':
             return Response({
@@ -1072,7 +1154,7 @@ class BookingViewSet(viewsets.ModelViewSet):
                 context['price_per_night'] = booking.base_price / nights if nights > 0 else booking.base_price
             
             # Charger le template HTML
-            template = get_template('bookings/receipt_template.html')
+            template = _get_receipt_template()
             html = template.render(context)
             
             # Créer le PDF
@@ -1224,35 +1306,32 @@ class BookingViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """
         Filtre les réservations selon le rôle utilisateur.
+        - Pour les propriétaires (espace propriétaire) : les réservations de leurs logements
+        - Pour les locataires et propriétaires (espace locataire) : leurs réservations
+        - Pour les administrateurs : toutes les réservations
         """
-        user = self.request.user
+        role = self.request.user.role
         is_owner_request = (
             self.request.path.startswith('/api/v1/bookings/') and 
             (self.request.GET.get('is_owner') == 'true' or 'owner' in self.request.path)
         )
         
-        if user.is_staff:
+        if role == 'staff':
             return Booking.objects.all().select_related(
                 'property', 'tenant', 'property__city', 'property__neighborhood'
             ).prefetch_related('property__images')
         
         # Protection : vérifier que c'est vraiment un propriétaire pour les requêtes owner
         if is_owner_request:
-            if not user.is_owner:
+            if role != 'owner':
                 return Booking.objects.none()
-            return Booking.objects.filter(property__owner=user).select_related(
+            return Booking.objects.filter(property__owner=self.request.user).select_related(
                 'property', 'tenant', 'property__city', 'property__neighborhood'  
             ).prefetch_related('property__images')
         
-        # Protection : s'assurer que les locataires ne voient que leurs réservations
-        if user.is_tenant or (user.is_owner and not is_owner_request):
-            return Booking.objects.filter(tenant=user).select_related(
-                'property', 'property__city', 'property__neighborhood'
-            ).prefetch_related('property__images')
-        
-        # Cas par défaut pour les propriétaires accédant aux routes non-owner
-        if user.is_owner:
-            return Booking.objects.filter(tenant=user).select_related(
+        # Locataires, et propriétaires hors espace propriétaire : leurs propres réservations
+        if role in ('tenant', 'owner'):
+            return Booking.objects.filter(tenant=self.request.user).select_related(
                 'property', 'property__city', 'property__neighborhood'
             ).prefetch_related('property__images')
         
@@ -1293,10 +1372,10 @@ class PromoCodeViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return PromoCode.objects.none()
         
-        if user.is_staff:
+        if user.role == 'staff':
             return PromoCode.objects.all().select_related('property', 'tenant', 'created_by')
         
-        if user.is_owner:
+        if user.role == 'owner':
             return PromoCode.objects.filter(property__owner=user).select_related('property', 'tenant', 'created_by')
         
         # Locataires : seulement les codes qui leur sont destinés
@@ -1322,16 +1401,15 @@ class PromoCodeViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            promo_code = PromoCode.objects.select_related('property', 'tenant').get(
-                code=code,
-                property_id=property_id,
-                is_active=True,
-                expiry_date__gt=timezone.now()
-            )
+            # Recherche mémoïsée : les saisies répétées ne touchent pas la base.
+            # La validation utilisateur ne compare ensuite que des clés étrangères
+            promo_code = PromoCode.get_cached(code, property_id)
+            if promo_code is None or not promo_code.is_valid():
+                raise PromoCode.DoesNotExist
             
             # Vérifier si le code est valide pour cet utilisateur
             if not promo_code.is_valid_for_user(request.user):
-                if promo_code.tenant:
+                if promo_code.tenant_id:
                     return Response({
                         "valid": False,
                         "detail": _("Ce code promo ne vous est pas destiné.")
@@ -1344,7 +1422,7 @@ class PromoCodeViewSet(viewsets.ModelViewSet):
             
             return Response({
                 "valid": True,
-                "promo_code": PromoCodeSerializer(promo_code, context={'request': request}).data
+                "promo_code": _get_serialized_promo_code(promo_code)
             })
             
         except PromoCode.DoesNotExist:
@@ -1359,6 +1437,21 @@ class PromoCodeViewSet(viewsets.ModelViewSet):
                 "detail": _("Erreur lors de la validation du code promo.")
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _review_summary_queryset():
+    """
+    Queryset des avis limité aux colonnes rendues par BookingReviewSerializer
+    (note, commentaire et nom de l'auteur). Le statut de la réservation est
+    conservé car Booking.__init__ le lit.
+    """
+    return BookingReview.objects.select_related(
+        'booking__tenant', 'booking__property__owner'
+    ).only(
+        'id', 'rating', 'comment', 'is_from_owner', 'created_at',
+        'booking__status',
+        'booking__tenant__first_name', 'booking__tenant__last_name',
+        'booking__property__owner__first_name', 'booking__property__owner__last_name',
+    )
+
 class BookingReviewViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour gérer les avis sur les réservations.
@@ -1381,19 +1474,27 @@ class BookingReviewViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return BookingReview.objects.none()
         
-        if user.is_staff:
-            return BookingReview.objects.all().select_related('booking__property', 'booking__tenant')
+        # En lecture, seules les colonnes rendues par le sérialiseur sont chargées ;
+        # les écritures gardent l'instance complète (updated_at doit être sauvegardé)
+        if self.action in ('list', 'retrieve'):
+            queryset = _review_summary_queryset()
+        else:
+            queryset = BookingReview.objects.select_related('booking__property', 'booking__tenant')
+        
+        if user.role == 'staff':
+            return queryset
         
-        # Propriétaires : avis sur leurs logements + leurs propres avis en tant que locataires
-        if user.is_owner:
-            return BookingReview.objects.filter(
-                Q(booking__property__owner=user) | Q(booking__tenant=user)
-            ).select_related('booking__property', 'booking__tenant')
+        # Propriétaires : avis sur leurs logements + leurs propres avis en tant que locataires.
+        # Les réservations concernées sont résolues dans une sous-requête sur Booking
+        # plutôt que par un OR sur deux jointures.
+        if user.role == 'owner':
+            booking_ids = Booking.objects.filter(
+                Q(property__owner=user) | Q(tenant=user)
+            ).values('id')
+            return queryset.filter(booking_id__in=booking_ids)
         
         # Locataires : uniquement leurs avis
-        return BookingReview.objects.filter(
-            booking__tenant=user
-        ).select_related('booking__property', 'booking__tenant')
+        return queryset.filter(booking__tenant=user)
     
     @action(detail=False, methods=['get'])
     def property_reviews(self, request):
@@ -1408,12 +1509,18 @@ class BookingReviewViewSet(viewsets.ModelViewSet):
                 "detail": _("ID de logement requis.")
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        reviews = BookingReview.objects.filter(
+        reviews = _review_summary_queryset().filter(
             booking__property_id=property_id,
             is_from_owner=False  # Uniquement les avis des locataires
-        ).select_related('booking', 'booking__tenant')
+        )
         
-        serializer = BookingReviewSerializer(reviews, many=True, context={'request': request})
+        page = self.paginate_queryset(reviews)
+        if page is not None:
+            serializer = BookingReviewSerializer(page, many=True, context={'request': request})
+            return self.get_paginated_response(serializer.data)
+        
+        # Sans pagination, parcourir les avis par lots pour borner la mémoire
+        serializer = BookingReviewSerializer(reviews.iterator(chunk_size=200), many=True, context={'request': request})
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
@@ -1429,11 +1536,17 @@ class BookingReviewViewSet(viewsets.ModelViewSet):
                 "detail": _("ID de locataire requis.")
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        reviews = BookingReview.objects.filter(
+        reviews = _review_summary_queryset().filter(
             booking__tenant_id=tenant_id,
             is_from_owner=True  # Uniquement les avis des propriétaires
-        ).select_related('booking', 'booking__property', 'booking__property__owner')
+        )
+        
+        page = self.paginate_queryset(reviews)
+        if page is not None:
+            serializer = BookingReviewSerializer(page, many=True, context={'request': request})
+            return self.get_paginated_response(serializer.data)
         
-        serializer = BookingReviewSerializer(reviews, many=True, context={'request': request})
+        # Sans pagination, parcourir les avis par lots pour borner la mémoire
+        serializer = BookingReviewSerializer(reviews.iterator(chunk_size=200), many=True, context={'request': request})
         return Response(serializer.data)
         
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'common'
+    
+    def ready(self):
+        """Importe les signaux lors du chargement de l'application."""
+        import common.signals
@@ -11,6 +11,10 @@ def require_role(*allowed_roles):
     @require_role('owner')
     @require_role('owner', 'admin')
     """
+    # Ensemble et message calculés une seule fois, à l'application du décorateur
+    allowed = frozenset(allowed_roles)
+    denied_detail = f'Cette ressource nécessite l\'un des rôles suivants: {", ".join(allowed_roles)}'
+    
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
@@ -19,15 +23,17 @@ def require_role(*allowed_roles):
                     'error': 'Authentication required'
                 }, status=401)
                 
+            role = request.user.role
+            
             # Les admins ont toujours accès
-            if request.user.is_staff:
+            if role == 'staff':
                 return view_func(request, *args, **kwargs)
                 
             # Vérifier le rôle
-            if request.user.user_type not in allowed_roles:
+            if role not in allowed:
                 return JsonResponse({
                     'error': 'Insufficient permissions',
-                    'detail': f'Cette ressource nécessite l\'un des rôles suivants: {", ".join(allowed_roles)}'
+                    'detail': denied_detail
                 }, status=403)
                 
             return view_func(request, *args, **kwargs)
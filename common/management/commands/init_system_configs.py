@@ -1,7 +1,8 @@
 # common/management/commands/init_system_configs.py
 import os
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
-from common.models import SystemConfiguration
+from common.models import SystemConfiguration, SYSTEM_CONFIG_TABLE_CACHE_KEY
 
 class Command(BaseCommand):
     help = 'Initialise les configurations système par défaut'
@@ -17,23 +18,39 @@ class Command(BaseCommand):
             # Ajoutez d'autres configurations système par défaut ici si nécessaire
         ]
         
-        created_count = 0
-        updated_count = 0
+        keys = [config['key'] for config in default_configs]
+        existing_keys = set(
+            SystemConfiguration.objects.filter(key__in=keys).values_list('key', flat=True)
+        )
+        
+        # Un seul upsert pour toutes les configurations
+        SystemConfiguration.objects.bulk_create(
+            [
+                SystemConfiguration(
+                    key=config['key'],
+                    value=config['value'],
+                    description=config['description']
+                )
+                for config in default_configs
+            ],
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['value', 'description', 'last_updated']
+        )
+        
+        # bulk_create n'émet pas de signaux : invalider le cache explicitement
+        cache.delete_many(
+            [SystemConfiguration.get_cache_key(key) for key in keys]
+            + [SystemConfiguration.get_public_cache_key(key) for key in keys]
+            + [SystemConfiguration.get_public_cache_key(), SYSTEM_CONFIG_TABLE_CACHE_KEY]
+        )
         
         for config in default_configs:
-            obj, created = SystemConfiguration.objects.update_or_create(
-                key=config['key'],
-                defaults={
-                    'value': config['value'],
-                    'description': config['description']
-                }
-            )
-            
-            if created:
-                created_count += 1
-                self.stdout.write(self.style.SUCCESS(f"Configuration créée: {config['key']} = {config['value']}"))
-            else:
-                updated_count += 1
+            if config['key'] in existing_keys:
                 self.stdout.write(self.style.WARNING(f"Configuration mise à jour: {config['key']} = {config['value']}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Configuration créée: {config['key']} = {config['value']}"))
         
-        self.stdout.write(self.style.SUCCESS(f"{created_count} configuration(s) créée(s), {updated_count} mise(s) à jour."))
\ No newline at end of file
+        updated_count = len(existing_keys)
+        created_count = len(keys) - updated_count
+        self.stdout.write(self.style.SUCCESS(f"{created_count} configuration(s) créée(s), {updated_count} mise(s) à jour."))
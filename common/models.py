@@ -1,6 +1,19 @@
 # common/models.py
 
 from django.db import models
+from django.core.cache import cache
+
+# Durée (secondes) de mise en cache des valeurs de configuration : le cache est
+# propre à chaque processus, l'invalidation ne touche que celui qui enregistre
+SYSTEM_CONFIG_CACHE_TIMEOUT = 300
+SYSTEM_CONFIG_CACHE_MISS = 'MISS'
+
+# Durée (secondes) de mise en cache de la réponse de l'endpoint public
+SYSTEM_CONFIG_PUBLIC_CACHE_TIMEOUT = 300
+
+# Durée (secondes) de mise en cache de la table complète des configurations
+SYSTEM_CONFIG_TABLE_CACHE_TIMEOUT = 300
+SYSTEM_CONFIG_TABLE_CACHE_KEY = 'sysconfig:table'
 
 class SystemConfiguration(models.Model):
     """Modèle pour les configurations système globales."""
@@ -17,14 +30,42 @@ class SystemConfiguration(models.Model):
     def __str__(self):
         return f"{self.key}: {self.value}"
     
+    @staticmethod
+    def get_cache_key(key):
+        """Clé de cache de la valeur d'une configuration."""
+        return f"sysconfig:{key}"
+    
+    @staticmethod
+    def get_public_cache_key(key=None):
+        """Clé de cache de la réponse de l'endpoint public (une clé ou toutes)."""
+        return f"sysconfig:public:{key or 'all'}"
+    
+    @classmethod
+    def get_all_cached(cls):
+        """
+        Retourne toutes les configurations (table de quelques dizaines de lignes),
+        mémorisées dans le cache et invalidées à chaque modification.
+        """
+        return cache.get_or_set(
+            SYSTEM_CONFIG_TABLE_CACHE_KEY,
+            lambda: list(cls.objects.order_by('pk')),
+            SYSTEM_CONFIG_TABLE_CACHE_TIMEOUT
+        )
+    
     @classmethod
     def get_value(cls, key, default=None):
-        """Récupère la valeur d'une configuration par sa clé."""
-        try:
-            config = cls.objects.get(key=key)
-            return config.value
-        except cls.DoesNotExist:
-            return default
+        """
+        Récupère la valeur d'une configuration par sa clé.
+        Les valeurs (et les clés absentes) sont mémorisées dans le cache ;
+        elles sont invalidées à chaque sauvegarde ou suppression.
+        """
+        def load():
+            # Seule la colonne value est lue (la clé est couverte par l'index unique)
+            value = cls.objects.filter(key=key).values_list('value', flat=True).first()
+            return SYSTEM_CONFIG_CACHE_MISS if value is None else value
+        
+        value = cache.get_or_set(cls.get_cache_key(key), load, SYSTEM_CONFIG_CACHE_TIMEOUT)
+        return default if value == SYSTEM_CONFIG_CACHE_MISS else value
     
     @classmethod
     def set_value(cls, key, value, description=None):
@@ -36,4 +77,5 @@ class SystemConfiguration(models.Model):
                 'description': description or ''
             }
         )
+        cache.delete_many([cls.get_cache_key(key), SYSTEM_CONFIG_TABLE_CACHE_KEY])
         return config
\ No newline at end of file
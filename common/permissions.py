@@ -30,12 +30,10 @@ class IsTenantRole(permissions.BasePermission):
 class RoleBasedPermission(permissions.BasePermission):
     """
     Permission flexible basée sur les rôles.
+    Les rôles autorisés sont un attribut de classe ; utiliser role_permission()
+    pour obtenir une classe paramétrée à placer dans permission_classes.
     """
-    def __init__(self, allowed_roles=None):
-        self.allowed_roles = allowed_roles or []
-    
-    def __call__(self):
-        return self
+    allowed_roles = frozenset()
     
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
@@ -46,4 +44,13 @@ class RoleBasedPermission(permissions.BasePermission):
             return True
             
         # Vérifier si le rôle de l'utilisateur est autorisé
-        return request.user.user_type in self.allowed_roles
\ No newline at end of file
+        return request.user.user_type in self.allowed_roles
+
+def role_permission(*roles):
+    """
+    Fabrique une sous-classe de RoleBasedPermission limitée aux rôles donnés.
+    
+    Usage:
+    permission_classes = [role_permission('owner', 'tenant')]
+    """
+    return type('RoleBasedPermission', (RoleBasedPermission,), {'allowed_roles': frozenset(roles)})
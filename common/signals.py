@@ -0,0 +1,16 @@
+# common/signals.py
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import SystemConfiguration, SYSTEM_CONFIG_TABLE_CACHE_KEY
+
+@receiver(post_save, sender=SystemConfiguration)
+@receiver(post_delete, sender=SystemConfiguration)
+def invalidate_system_configuration_cache(sender, instance, **kwargs):
+    """Invalide la valeur en cache d'une configuration modifiée ou supprimée (ex. depuis l'admin)."""
+    cache.delete_many([
+        SystemConfiguration.get_cache_key(instance.key),
+        SystemConfiguration.get_public_cache_key(),
+        SystemConfiguration.get_public_cache_key(instance.key),
+        SYSTEM_CONFIG_TABLE_CACHE_KEY,
+    ])
@@ -2,9 +2,13 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import SystemConfiguration
+from django.core.cache import cache
+from .models import SystemConfiguration, SYSTEM_CONFIG_PUBLIC_CACHE_TIMEOUT
 from .serializers import SystemConfigurationSerializer
 
+# Clés de configuration accessibles publiquement
+PUBLIC_CONFIG_KEYS = frozenset({'CANCELLATION_GRACE_PERIOD_MINUTES'})
+
 class SystemConfigurationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet pour accéder aux configurations système en lecture seule.
@@ -28,24 +32,58 @@ class SystemConfigurationViewSet(viewsets.ReadOnlyModelViewSet):
         
         return queryset
     
+    def get_visible_configs(self):
+        """
+        Équivalent en mémoire de get_queryset, à partir de la table en cache :
+        aucune requête SQL (ni COUNT de pagination) lorsque le cache est chaud.
+        """
+        configs = SystemConfiguration.get_all_cached()
+        
+        if not self.request.user.is_staff:
+            configs = [config for config in configs if not config.key.startswith('ADMIN_')]
+        
+        key = self.request.query_params.get('key', None)
+        if key:
+            configs = [config for config in configs if config.key == key]
+        
+        return configs
+    
+    def list(self, request, *args, **kwargs):
+        configs = self.get_visible_configs()
+        
+        # La pagination DRF accepte aussi une simple liste
+        page = self.paginate_queryset(configs)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = self.get_serializer(configs, many=True)
+        return Response(serializer.data)
+    
     @action(detail=False, methods=['get'])
     def public(self, request):
         """
         Endpoint pour récupérer les configurations publiques.
         Pas besoin d'authentification.
         """
-        # Liste des clés accessibles publiquement
-        public_keys = ['CANCELLATION_GRACE_PERIOD_MINUTES']
-        
-        queryset = SystemConfiguration.objects.filter(key__in=public_keys)
-        
         # Filtrer par clé si spécifiée
         key = request.query_params.get('key', None)
-        if key and key in public_keys:
-            queryset = queryset.filter(key=key)
+        if key not in PUBLIC_CONFIG_KEYS:
+            key = None
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        # Réponse mise en cache (invalidée à chaque modification de configuration)
+        cache_key = SystemConfiguration.get_public_cache_key(key)
+        data = cache.get(cache_key)
+        if data is None:
+            queryset = SystemConfiguration.objects.filter(key__in=PUBLIC_CONFIG_KEYS)
+            if key:
+                queryset = queryset.filter(key=key)
+            
+            serializer = self.get_serializer(queryset, many=True)
+            data = serializer.data
+            cache.set(cache_key, data, SYSTEM_CONFIG_PUBLIC_CACHE_TIMEOUT)
+        
+        return Response(data)
     
     @action(detail=False, methods=['get'])
     def by_key(self, request):
@@ -56,10 +94,11 @@ class SystemConfigurationViewSet(viewsets.ReadOnlyModelViewSet):
         if not key:
             return Response({"detail": "Le paramètre 'key' est requis."}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            config = self.get_queryset().get(key=key)
-            serializer = self.get_serializer(config)
-            return Response(serializer.data)
-        except SystemConfiguration.DoesNotExist:
+        # get_visible_configs filtre déjà sur le paramètre 'key'
+        config = next(iter(self.get_visible_configs()), None)
+        if config is None:
             return Response({"detail": f"Configuration '{key}' non trouvée."}, status=status.HTTP_404_NOT_FOUND)
+        
+        serializer = self.get_serializer(config)
+        return Response(serializer.data)
 
@@ -1,20 +1,96 @@
 # communications/consumers.py
 # Consumers WebSocket pour les communications en temps réel
 
-import json
+import asyncio
+import msgpack
+import orjson
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import cached_property
 from django.contrib.auth import get_user_model
-from .models import Conversation, Message, Notification
+from .middleware import get_query_param
+from .models import Conversation, Message, Notification, CONVERSATION_ACCESS_CACHE_TIMEOUT
+from .services.message_filter_service import MessageFilterService, ANTI_DISINTERMEDIATION_WARNING
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
-class ChatConsumer(AsyncWebsocketConsumer):
+# Nombre maximal de créations de notifications simultanées par processus :
+# au-delà, les tâches attendent au lieu d'occuper tout le pool de threads
+NOTIFICATION_TASKS_LIMIT = 64
+notification_slots = asyncio.Semaphore(NOTIFICATION_TASKS_LIMIT)
+
+# Intervalle minimal (secondes) entre deux mises à jour de updated_at d'une conversation
+CONVERSATION_TOUCH_INTERVAL = 2
+
+# Étiquette des trames de frappe MessagePack (premier élément du tableau)
+TYPING_FRAME_TAG = 2
+
+# Nombre maximal de trames reçues en attente de traitement par connexion
+INBOX_MAXSIZE = 32
+
+class JSONFrameMixin:
+    """
+    Envoi des trames JSON aux clients WebSocket.
+    Les clients qui se connectent avec ?frames=binary reçoivent des trames
+    binaires : les octets produits par orjson partent tels quels, sans
+    décodage puis ré-encodage UTF-8. Les autres clients reçoivent du texte.
+    Les clients qui se connectent avec ?batch=1 reçoivent les trames émises
+    ensemble par un même handler regroupées en une seule trame de type 'batch'.
+    Les clients qui se connectent avec ?typing=msgpack reçoivent les
+    indicateurs de frappe en trames binaires MessagePack compactes.
+    """
+    
+    def query_param(self, name):
+        # Lecture des octets bruts, comme le token (voir middleware.get_query_param)
+        return get_query_param(self.scope.get('query_string', b''), name)
+    
+    @cached_property
+    def binary_frames(self):
+        return self.query_param(b'frames') == b'binary'
+    
+    @cached_property
+    def batch_frames(self):
+        return self.query_param(b'batch') == b'1'
+    
+    @cached_property
+    def msgpack_typing(self):
+        return self.query_param(b'typing') == b'msgpack'
+    
+    async def send_frame(self, payload):
+        data = orjson.dumps(payload)
+        if self.binary_frames:
+            await self.send(bytes_data=data)
+        else:
+            await self.send(text_data=data.decode())
+    
+    async def send_frames(self, payloads):
+        """
+        Envoie plusieurs trames logiques : une seule écriture WebSocket
+        pour les clients en mode batch, une trame par élément sinon.
+        """
+        if self.batch_frames and len(payloads) > 1:
+            await self.send_frame({'type': 'batch', 'items': payloads})
+            return
+        for payload in payloads:
+            await self.send_frame(payload)
+
+class ChatConsumer(JSONFrameMixin, AsyncWebsocketConsumer):
     """
     Consumer pour les conversations en temps réel.
     """
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Références des tâches d'arrière-plan (évite leur collecte prématurée)
+        self.background_tasks = set()
+        # File bornée des trames reçues, traitées dans l'ordre par inbox_worker
+        self.inbox = asyncio.Queue(maxsize=INBOX_MAXSIZE)
+        self.inbox_worker = None
+    
     async def connect(self):
         """
         Appelé lorsqu'un client WebSocket tente de se connecter.
@@ -28,6 +104,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self.close(code=4001)
                 return
             
+            # Identité de l'expéditeur calculée une fois pour toute la connexion
+            self.sender_name = self.user.get_full_name() or self.user.email
+            self.sender_details = {
+                'id': str(self.user.id),
+                'first_name': self.user.first_name,
+                'last_name': self.user.last_name,
+                'email': self.user.email
+            }
+            
             # Récupérer l'ID de la conversation depuis les paramètres de l'URL
             self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
             logger.info(f"Attempting to connect to conversation: {self.conversation_id}")
@@ -50,6 +135,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             
             # Accepter la connexion WebSocket
             await self.accept()
+            self.inbox_worker = asyncio.create_task(self.process_inbox())
             logger.info(f"WebSocket connection accepted for user {self.user.id} in conversation {self.conversation_id}")
             
         except Exception as e:
@@ -64,6 +150,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         logger.info(f"WebSocket disconnected with code: {close_code}")
         
+        # Abandonner les trames encore en attente
+        if self.inbox_worker:
+            self.inbox_worker.cancel()
+        
         # Arrêter l'indicateur de frappe si actif
         if hasattr(self, 'room_group_name'):
             await self.channel_layer.group_send(
@@ -71,7 +161,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 {
                     'type': 'user_typing',
                     'user_id': str(self.user.id),
-                    'user_name': self.user.get_full_name() or self.user.email,
+                    'user_name': self.sender_name,
                     'is_typing': False
                 }
             )
@@ -82,12 +172,32 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
     
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """
         Appelé lorsque le client WebSocket envoie un message.
+        La trame est mise en file ; un client qui envoie plus vite qu'elles ne
+        sont traitées remplit la file et sa connexion est fermée (4008).
+        """
+        try:
+            self.inbox.put_nowait(text_data if text_data is not None else bytes_data)
+        except asyncio.QueueFull:
+            logger.warning(f"WebSocket inbox full for user {self.user.id}, closing connection")
+            await self.close(code=4008)
+    
+    async def process_inbox(self):
+        """
+        Traite les trames reçues une à une, dans l'ordre d'arrivée.
+        """
+        while True:
+            data = await self.inbox.get()
+            await self.handle_frame(data)
+    
+    async def handle_frame(self, data):
+        """
+        Traite une trame reçue du client WebSocket.
         """
         try:
-            text_data_json = json.loads(text_data)
+            text_data_json = orjson.loads(data)
             message_type = text_data_json.get('type', 'message')
             
             # Traiter différents types de messages
@@ -97,41 +207,34 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 # Sauvegarder le message dans la base de données
                 message = await self.save_message(content)
                 
-                # Envoyer le message au groupe de discussion
+                # Envoyer le message au groupe de discussion ; l'arrêt de
+                # l'indicateur de frappe voyage dans le même événement
                 await self.channel_layer.group_send(
                     self.room_group_name,
                     {
                         'type': 'chat_message',
+                        'stop_typing_for': str(self.user.id),
                         'message': {
                             'id': str(message.id),
                             'sender_id': str(self.user.id),
-                            'sender_name': self.user.get_full_name() or self.user.email,
+                            'sender_name': self.sender_name,
                             'content': message.content,  # Utiliser le contenu filtré
                             'created_at': message.created_at.isoformat(),
                             'message_type': message.message_type,
-                            'sender_details': {
-                                'id': str(self.user.id),
-                                'first_name': self.user.first_name,
-                                'last_name': self.user.last_name,
-                                'email': self.user.email
-                            },
+                            'sender_details': self.sender_details,
                             'is_read': False,
                             'has_filtered_content': message.is_filtered,
-                            'anti_disintermediation_warning': message.get_anti_disintermediation_warning() if message.is_filtered else None
+                            # Un message filtré implique des contacts non révélés : pas de nouvelle vérification
+                            'anti_disintermediation_warning': ANTI_DISINTERMEDIATION_WARNING if message.is_filtered else None
                         }
                     }
                 )
                 
-                # Arrêter l'indicateur de frappe automatiquement après envoi
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'user_typing',
-                        'user_id': str(self.user.id),
-                        'user_name': self.user.get_full_name() or self.user.email,
-                        'is_typing': False
-                    }
-                )
+                # Notifier les autres participants en arrière-plan : l'expéditeur
+                # n'attend pas la création des notifications
+                task = asyncio.create_task(self.notify_participants(message))
+                self.background_tasks.add(task)
+                task.add_done_callback(self.background_tasks.discard)
             
             elif message_type == 'typing':
                 # Informer les autres utilisateurs que quelqu'un est en train d'écrire
@@ -142,24 +245,25 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     {
                         'type': 'user_typing',
                         'user_id': str(self.user.id),
-                        'user_name': self.user.get_full_name() or self.user.email,
+                        'user_name': self.sender_name,
                         'is_typing': is_typing
                     }
                 )
             
             elif message_type == 'read':
                 # Marquer les messages comme lus
-                await self.mark_messages_as_read()
+                read_ids = await self.mark_messages_as_read()
                 
                 await self.channel_layer.group_send(
                     self.room_group_name,
                     {
                         'type': 'messages_read',
-                        'user_id': str(self.user.id)
+                        'user_id': str(self.user.id),
+                        'message_ids': [str(message_id) for message_id in read_ids]
                     }
                 )
                 
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             logger.error("Invalid JSON received")
         except Exception as e:
             logger.error(f"Error processing WebSocket message: {e}")
@@ -171,10 +275,26 @@ class ChatConsumer(AsyncWebsocketConsumer):
         message = event['message']
         
         # Envoyer le message au client WebSocket
-        await self.send(text_data=json.dumps({
+        frames = [{
             'type': 'message',
             'message': message
-        }))
+        }]
+        
+        # Arrêter l'indicateur de frappe de l'expéditeur (sauf pour lui-même)
+        stop_typing_for = event.get('stop_typing_for')
+        if stop_typing_for and stop_typing_for != str(self.user.id):
+            if self.msgpack_typing:
+                await self.send_frames(frames)
+                await self.send_typing_packed(stop_typing_for, message['sender_name'], False)
+                return
+            frames.append({
+                'type': 'typing',
+                'user_id': stop_typing_for,
+                'user_name': message['sender_name'],
+                'is_typing': False
+            })
+        
+        await self.send_frames(frames)
     
     async def user_typing(self, event):
         """
@@ -182,50 +302,83 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         # Ne pas renvoyer sa propre notification de frappe
         if event['user_id'] != str(self.user.id):
+            if self.msgpack_typing:
+                await self.send_typing_packed(event['user_id'], event['user_name'], event['is_typing'])
+                return
+            
             # Envoyer l'information au client WebSocket
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'typing',
                 'user_id': event['user_id'],
                 'user_name': event['user_name'],
                 'is_typing': event['is_typing']
-            }))
+            })
+    
+    async def send_typing_packed(self, user_id, user_name, is_typing):
+        """
+        Envoie un indicateur de frappe en trame binaire MessagePack :
+        [étiquette de type, user_id, user_name, is_typing].
+        """
+        await self.send(bytes_data=msgpack.packb(
+            [TYPING_FRAME_TAG, user_id, user_name, is_typing],
+            use_bin_type=True
+        ))
     
     async def messages_read(self, event):
         """
         Appelé lorsque des messages sont marqués comme lus.
         """
         # Envoyer l'information au client WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'read',
-            'user_id': event['user_id']
-        }))
+            'user_id': event['user_id'],
+            'message_ids': event.get('message_ids', [])
+        })
     
-    @database_sync_to_async
-    def can_access_conversation(self, conversation_id, user_id):
+    async def can_access_conversation(self, conversation_id, user_id):
         """
         Vérifie si l'utilisateur a accès à la conversation.
+        Mémorise le logement de la conversation pour la durée de la connexion :
+        une connexion reste liée à une seule conversation et un seul utilisateur.
+        Le résultat est mis en cache (invalidé lors des changements de
+        participants) : une reconnexion ne coûte aucune requête SQL.
+        """
+        cache_key = Conversation.get_access_cache_key(conversation_id, user_id)
+        access = await cache.aget(cache_key)
+        if access is None:
+            access = await self.load_conversation_access(conversation_id, user_id)
+            if access is None:
+                return False
+            await cache.aset(cache_key, access, CONVERSATION_ACCESS_CACHE_TIMEOUT)
+        
+        has_access, self.conversation_property_id = access
+        return has_access
+    
+    @database_sync_to_async
+    def load_conversation_access(self, conversation_id, user_id):
+        """
+        Charge depuis la base le couple (accès autorisé, logement de la conversation),
+        ou None si la conversation n'existe pas.
         """
         try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            return conversation.participants.filter(id=user_id).exists()
+            conversation = Conversation.objects.only('id', 'property').get(id=conversation_id)
+            return conversation.participants.filter(id=user_id).exists(), conversation.property_id
         except Conversation.DoesNotExist:
             logger.error(f"Conversation {conversation_id} does not exist")
-            return False
+            return None
         except Exception as e:
             logger.error(f"Error checking conversation access: {e}")
-            return False
+            return None
     
     @database_sync_to_async
     def save_message(self, content):
         """
         Sauvegarde un message dans la base de données avec filtrage.
         """
-        from .services.message_filter_service import MessageFilterService
-        
-        conversation = Conversation.objects.get(id=self.conversation_id)
-        
-        # Vérifier si on doit révéler les contacts
-        booking_confirmed = MessageFilterService.should_reveal_contacts(conversation)
+        # Vérifier si on doit révéler les contacts (conversation validée à la connexion)
+        booking_confirmed = MessageFilterService.should_reveal_contacts_for(
+            self.conversation_id, self.conversation_property_id
+        )
         
         # Appliquer le filtrage si nécessaire
         if not booking_confirmed:
@@ -236,38 +389,59 @@ class ChatConsumer(AsyncWebsocketConsumer):
             filtered_content = content
             masked_items = []
         
-        # Créer le message avec le contenu filtré
-        message = Message.objects.create(
-            conversation=conversation,
-            sender=self.user,
-            content=filtered_content,
-            original_content=content,
-            message_type='text',
-            is_filtered=bool(masked_items),
-            masked_items=masked_items
-        )
-        
-        # Marquer le message comme venant du WebSocket pour éviter double traitement
-        message._from_websocket = True
-        
-        # Mettre à jour la date de dernière mise à jour de la conversation
-        conversation.updated_at = message.created_at
-        conversation.save(update_fields=['updated_at'])
-        
-        # Créer des notifications pour les autres participants
-        Notification.create_for_new_message(message)
+        with transaction.atomic():
+            # Créer le message avec le contenu filtré
+            message = Message.objects.create(
+                conversation_id=self.conversation_id,
+                sender=self.user,
+                content=filtered_content,
+                original_content=content,
+                message_type='text',
+                is_filtered=bool(masked_items),
+                masked_items=masked_items
+            )
+            
+            # Marquer le message comme venant du WebSocket pour éviter double traitement
+            message._from_websocket = True
+            
+            # Mettre à jour le dernier message de la conversation (un seul UPDATE) ; la date
+            # de dernière mise à jour n'est réécrite qu'une fois par intervalle
+            fields = {'last_message': message}
+            if cache.add(f"conv_touch:{self.conversation_id}", 1, CONVERSATION_TOUCH_INTERVAL):
+                fields['updated_at'] = message.created_at
+            Conversation.objects.filter(pk=self.conversation_id).update(**fields)
         
         return message
     
+    async def notify_participants(self, message):
+        """
+        Crée les notifications d'un message dans la limite des créations
+        simultanées autorisées (contre-pression en cas de rafale).
+        """
+        async with notification_slots:
+            await self.create_notifications(message)
+    
+    @database_sync_to_async
+    def create_notifications(self, message):
+        """
+        Crée les notifications des autres participants pour un message.
+        Exécuté hors du chemin de réponse : une erreur est journalisée sans
+        affecter l'envoi du message.
+        """
+        try:
+            Notification.create_for_new_message(message)
+        except Exception as e:
+            logger.error(f"Error creating notifications for message {message.id}: {e}")
+    
     @database_sync_to_async
     def mark_messages_as_read(self):
         """
         Marque tous les messages non lus de la conversation comme lus pour l'utilisateur.
         """
-        conversation = Conversation.objects.get(id=self.conversation_id)
-        conversation.mark_as_read(self.user)
+        # Conversation validée à la connexion : sa clé suffit
+        return Conversation(pk=self.conversation_id).mark_as_read(self.user)
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(JSONFrameMixin, AsyncWebsocketConsumer):
     """
     Consumer pour les notifications en temps réel.
     """
@@ -312,10 +486,10 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         notification = event['notification']
         
         # Envoyer la notification au client WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'notification',
             'notification': notification
-        }))
+        })
     
     async def notification_read(self, event):
         """
@@ -324,7 +498,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         notification_id = event['notification_id']
         
         # Envoyer l'information au client WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'notification_read',
             'notification_id': notification_id
-        }))
\ No newline at end of file
+        })
\ No newline at end of file
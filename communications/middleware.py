@@ -2,24 +2,71 @@
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from urllib.parse import parse_qs
+from urllib.parse import unquote
 import logging
+import time
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Durée maximale (secondes) de mise en cache de l'utilisateur d'un token
+# (bornée en plus par l'expiration du token)
+WS_USER_CACHE_TIMEOUT = 300
+
+# Seuls champs utilisés par les consumers
+WS_USER_FIELDS = ('id', 'email', 'first_name', 'last_name', 'user_type', 'is_active', 'is_staff')
+
 @database_sync_to_async
 def get_user(user_id):
     """
-    Récupère un utilisateur à partir de son ID.
+    Récupère un utilisateur actif à partir de son ID.
     """
     try:
-        return User.objects.get(id=user_id)
+        return User.objects.only(*WS_USER_FIELDS).get(id=user_id, is_active=True)
     except User.DoesNotExist:
         return AnonymousUser()
 
+async def get_user_for_token(access_token):
+    """
+    Récupère l'utilisateur d'un token d'accès depuis la base, avec mise en
+    cache par token (jti), afin que les reconnexions avec le même token
+    n'interrogent pas la base.
+    """
+    user_id = access_token.payload.get('user_id')
+    cache_key = f"wsuser:{access_token.payload.get('jti')}:{user_id}"
+    
+    user = await cache.aget(cache_key)
+    if user is None:
+        user = await get_user(user_id)
+        timeout = min(int(access_token.payload['exp'] - time.time()), WS_USER_CACHE_TIMEOUT)
+        if user.is_authenticated and timeout > 0:
+            await cache.aset(cache_key, user, timeout)
+    return user
+
+def get_query_param(query_string, name):
+    """
+    Valeur brute (octets, non décodée) du paramètre name de la query string
+    brute, sans décoder les autres paramètres. None si absent.
+    """
+    prefix = name + b'='
+    for part in query_string.split(b'&'):
+        if part.startswith(prefix):
+            return part[len(prefix):]
+    return None
+
+def get_query_token(query_string):
+    """
+    Extrait le paramètre token de la query string brute (octets), sans
+    décoder les autres paramètres.
+    """
+    token = get_query_param(query_string, b'token')
+    if not token:
+        return None
+    return unquote(token.decode('latin-1')) or None
+
 class TokenAuthMiddleware:
     """
     Middleware JWT pour authentifier les utilisateurs dans les WebSockets.
@@ -29,12 +76,8 @@ class TokenAuthMiddleware:
         self.app = app
     
     async def __call__(self, scope, receive, send):
-        # Récupérer le token JWT depuis les paramètres de la requête
-        query_string = scope.get('query_string', b'').decode()
-        query_params = parse_qs(query_string)
-        
-        # Extraire le token du query string
-        token = query_params.get('token', [None])[0]
+        # Extraire le token JWT du query string
+        token = get_query_token(scope.get('query_string', b''))
         
         if token:
             try:
@@ -43,7 +86,7 @@ class TokenAuthMiddleware:
                 user_id = access_token.payload.get('user_id')
                 
                 # Récupérer l'utilisateur
-                scope['user'] = await get_user(user_id)
+                scope['user'] = await get_user_for_token(access_token)
                 logger.info(f"WebSocket authenticated for user: {user_id}")
             except InvalidToken as e:
                 logger.warning(f"Invalid token for WebSocket: {e}")
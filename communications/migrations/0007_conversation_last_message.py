@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-16 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_last_message(apps, schema_editor):
+    Conversation = apps.get_model('communications', 'Conversation')
+    Message = apps.get_model('communications', 'Message')
+    last_message = Message.objects.filter(
+        conversation=models.OuterRef('pk')
+    ).order_by('-created_at').values('pk')[:1]
+    Conversation.objects.update(last_message=models.Subquery(last_message))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0006_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='communications.message', verbose_name='dernier message'),
+        ),
+        migrations.RunPython(fill_last_message, migrations.RunPython.noop),
+    ]
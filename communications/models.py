@@ -3,6 +3,8 @@
 
 import uuid
 from django.db import models
+from django.db.models import Count, Case, When, OuterRef, Subquery, Prefetch, IntegerField
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -12,13 +14,79 @@ from typing import Tuple, List
 
 User = get_user_model()
 
+# Durée (secondes) de mise en cache du droit d'accès à une conversation (WebSocket)
+CONVERSATION_ACCESS_CACHE_TIMEOUT = 300
+
+class ConversationQuerySet(models.QuerySet):
+    """
+    QuerySet des conversations, avec les chargements nécessaires à leur sérialisation.
+    """
+    
+    def with_unread_count(self, user):
+        """
+        Annote chaque conversation du nombre de messages non lus par
+        l'utilisateur (unread_count_annotated), dans la requête de la liste
+        au lieu d'une requête COUNT par conversation.
+        Même règle que Conversation.get_unread_count.
+        """
+        def count_of(messages):
+            return Coalesce(Subquery(
+                messages.order_by().values('conversation').annotate(total=Count('pk')).values('total'),
+                output_field=IntegerField()
+            ), 0)
+        
+        last_read_at = ConversationParticipant.objects.filter(
+            conversation=OuterRef('pk'), user_id=user.id
+        ).values('last_read_at')[:1]
+        
+        # Les messages lus un à un (read_by) ne sont jamais comptés
+        unread = Message.objects.filter(
+            conversation=OuterRef('pk')
+        ).exclude(sender_id=user.id).exclude(read_by=user)
+        
+        return self.annotate(
+            user_last_read_at=Subquery(last_read_at)
+        ).annotate(
+            unread_count_annotated=Case(
+                # Participation jamais marquée comme lue depuis l'ajout de last_read_at
+                When(user_last_read_at__isnull=True, then=count_of(unread)),
+                default=count_of(unread.filter(created_at__gt=OuterRef('user_last_read_at'))),
+                output_field=IntegerField()
+            )
+        )
+    
+    def for_list(self, user):
+        """
+        Conversations prêtes pour ConversationSerializer : participants et
+        profils, logement, dernier message et nombre de non lus chargés en
+        un nombre constant de requêtes.
+        """
+        return self.with_unread_count(user).select_related(
+            'property__city', 'property__neighborhood', 'property__owner',
+            'last_message__sender'
+        ).prefetch_related(
+            Prefetch('participants', queryset=User.objects.select_related('profile'))
+        )
+
+class MessageQuerySet(models.QuerySet):
+    """
+    QuerySet des messages, avec les chargements nécessaires à leur sérialisation.
+    """
+    
+    def for_list(self):
+        """
+        Messages prêts pour MessageSerializer : conversation, expéditeur et
+        son profil (sender_details) chargés dans la même requête.
+        """
+        return self.select_related('conversation', 'sender__profile')
+
 class Conversation(models.Model):
     """
     Modèle pour les conversations entre utilisateurs.
     Une conversation peut être liée à un logement spécifique.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    participants = models.ManyToManyField(User, related_name='conversations')
+    participants = models.ManyToManyField(User, related_name='conversations', through='ConversationParticipant')
     property = models.ForeignKey(
         Property, 
         on_delete=models.CASCADE, 
@@ -26,11 +94,22 @@ class Conversation(models.Model):
         null=True,
         blank=True
     )
+    # Dernier message, dénormalisé pour la liste des conversations
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        verbose_name=_('dernier message')
+    )
     
     is_active = models.BooleanField(_('active'), default=True)
     created_at = models.DateTimeField(_('date de création'), auto_now_add=True)
     updated_at = models.DateTimeField(_('date de dernière mise à jour'), auto_now=True)
     
+    objects = ConversationQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('conversation')
         verbose_name_plural = _('conversations')
@@ -38,16 +117,24 @@ class Conversation(models.Model):
         db_table = 'findam_conversations'
     
     def __str__(self):
-        participants_str = ", ".join([p.email for p in self.participants.all()[:3]])
-        if self.participants.count() > 3:
+        # Un quatrième participant suffit à savoir s'il faut compter les autres
+        participants = list(self.participants.all()[:4])
+        participants_str = ", ".join([p.email for p in participants[:3]])
+        if len(participants) > 3:
             participants_str += f" et {self.participants.count() - 3} autre(s)"
         
         property_str = f" - {self.property.title}" if self.property else ""
         return f"Conversation: {participants_str}{property_str}"
     
+    @staticmethod
+    def get_access_cache_key(conversation_id, user_id):
+        """Clé de cache du droit d'accès d'un utilisateur à une conversation."""
+        return f"cvacc:{conversation_id}:{user_id}"
+    
     def add_message(self, sender, content, message_type='text'):
         """
-        Ajoute un message à la conversation et met à jour sa date de dernière mise à jour.
+        Ajoute un message à la conversation et met à jour son dernier message
+        et sa date de dernière mise à jour.
         """
         message = Message.objects.create(
             conversation=self,
@@ -55,8 +142,9 @@ class Conversation(models.Model):
             content=content,
             message_type=message_type
         )
+        self.last_message = message
         self.updated_at = timezone.now()
-        self.save(update_fields=['updated_at'])
+        self.save(update_fields=['last_message', 'updated_at'])
         return message
     
     def get_other_participant(self, user):
@@ -69,10 +157,62 @@ class Conversation(models.Model):
     def mark_as_read(self, user):
         """
         Marque tous les messages non lus de la conversation comme lus pour un utilisateur donné.
+        Avance la date de dernière lecture du participant (un seul UPDATE), puis
+        renseigne read_by (utilisé par Message.is_read_by) pour les seuls messages
+        postérieurs à la lecture précédente, en une seule insertion.
+        
+        Returns:
+            list: Identifiants des messages nouvellement marqués comme lus
+        """
+        participation = ConversationParticipant.objects.filter(conversation_id=self.pk, user_id=user.id)
+        last_read_at = participation.values_list('last_read_at', flat=True).first()
+        participation.update(last_read_at=timezone.now())
+        
+        unread_messages = self.messages.exclude(sender=user)
+        if last_read_at:
+            unread_messages = unread_messages.filter(created_at__gt=last_read_at)
+        unread_ids = list(unread_messages.exclude(read_by=user).values_list('id', flat=True))
+        
+        through = Message.read_by.through
+        through.objects.bulk_create(
+            [through(message_id=message_id, user_id=user.id) for message_id in unread_ids],
+            ignore_conflicts=True
+        )
+        return unread_ids
+    
+    def get_unread_count(self, user):
+        """
+        Nombre de messages reçus par l'utilisateur depuis sa dernière lecture,
+        hors messages lus un à un (read_by, voir Message.mark_as_read).
         """
-        unread_messages = self.messages.filter(read_by__isnull=True).exclude(sender=user)
-        for message in unread_messages:
-            message.mark_as_read(user)
+        last_read_at = ConversationParticipant.objects.filter(
+            conversation_id=self.pk, user_id=user.id
+        ).values_list('last_read_at', flat=True).first()
+        
+        unread_messages = self.messages.exclude(sender=user).exclude(read_by=user)
+        if last_read_at:
+            # Participation déjà lue : seuls les messages postérieurs restent à examiner
+            unread_messages = unread_messages.filter(created_at__gt=last_read_at)
+        return unread_messages.count()
+
+class ConversationParticipant(models.Model):
+    """
+    Participation d'un utilisateur à une conversation (table de liaison de
+    Conversation.participants), avec sa date de dernière lecture.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='participations')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_participations')
+    last_read_at = models.DateTimeField(_('date de dernière lecture'), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('participant à une conversation')
+        verbose_name_plural = _('participants aux conversations')
+        # Table créée à l'origine par le ManyToManyField, conservée telle quelle
+        db_table = 'findam_conversations_participants'
+        unique_together = [('conversation', 'user')]
+    
+    def __str__(self):
+        return f"{self.user_id} dans {self.conversation_id}"
 
 class Message(models.Model):
     """
@@ -100,6 +240,8 @@ class Message(models.Model):
     created_at = models.DateTimeField(_('date d\'envoi'), auto_now_add=True)
     updated_at = models.DateTimeField(_('date de dernière mise à jour'), auto_now=True)
 
+    objects = MessageQuerySet.as_manager()
+
     # Nouveaux champs pour le filtrage
     original_content = models.TextField(_('contenu original'), blank=True)
     is_filtered = models.BooleanField(_('contenu filtré'), default=False)
@@ -110,6 +252,9 @@ class Message(models.Model):
         verbose_name_plural = _('messages')
         ordering = ['created_at']
         db_table = 'findam_messages'
+        indexes = [
+            models.Index(fields=['conversation', 'created_at'], name='msg_conversation_created_idx'),
+        ]
     
     def __str__(self):
         return f"Message de {self.sender.email} - {self.created_at.strftime('%d/%m/%Y %H:%M')}"
@@ -126,26 +271,35 @@ class Message(models.Model):
         """
         return self.read_by.filter(id=user.id).exists()
     
-    def get_unfiltered_content(self):
+    def get_unfiltered_content(self, contacts_revealed=None):
         """
         Retourne le contenu non filtré si autorisé.
+        contacts_revealed peut être fourni par l'appelant (calculé pour toute
+        une page de messages) ; à défaut il est déterminé ici.
         """
         from .services.message_filter_service import MessageFilterService
         
-        if MessageFilterService.should_reveal_contacts(self.conversation):
+        if contacts_revealed is None:
+            contacts_revealed = MessageFilterService.should_reveal_contacts(self.conversation)
+        
+        if contacts_revealed:
             return self.original_content or self.content
         return self.content
 
-    def get_anti_disintermediation_warning(self):
+    def get_anti_disintermediation_warning(self, contacts_revealed=None):
         """
         Retourne l'avertissement anti-désintermédiation si nécessaire.
+        contacts_revealed peut être fourni par l'appelant, comme pour
+        get_unfiltered_content ; il n'est déterminé ici qu'en cas de masquage.
         """
-        from .services.message_filter_service import MessageFilterService
+        from .services.message_filter_service import MessageFilterService, ANTI_DISINTERMEDIATION_WARNING
+        
+        if not (self.is_filtered and self.masked_items):
+            return None
         
-        if self.is_filtered and self.masked_items:
-            if not MessageFilterService.should_reveal_contacts(self.conversation):
-                return MessageFilterService.get_anti_disintermediation_warning()
-        return None
+        if contacts_revealed is None:
+            contacts_revealed = MessageFilterService.should_reveal_contacts(self.conversation)
+        return None if contacts_revealed else ANTI_DISINTERMEDIATION_WARNING
 
 class MessageFilterService:
     """Service temporaire pour filtrage - à déplacer plus tard."""
@@ -248,6 +402,14 @@ class Notification(models.Model):
         verbose_name_plural = _('notifications')
         ordering = ['-created_at']
         db_table = 'findam_notifications'
+        indexes = [
+            models.Index(fields=['recipient', '-created_at'], name='notif_recipient_created_idx'),
+            models.Index(
+                fields=['recipient'],
+                condition=models.Q(is_read=False),
+                name='notif_unread_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"Notification pour {self.recipient.email} - {self.title}"
@@ -262,23 +424,41 @@ class Notification(models.Model):
     @classmethod
     def create_for_new_message(cls, message):
         """
-        Crée une notification pour un nouveau message.
+        Crée les notifications d'un nouveau message pour tous les autres participants,
+        en une seule insertion, puis les diffuse en temps réel.
+        
+        Returns:
+            list: Les notifications créées
         """
-        # Récupérer les destinataires (tous les participants sauf l'expéditeur)
-        recipients = message.conversation.participants.exclude(id=message.sender.id)
+        from .signals import broadcast_notification
         
-        for recipient in recipients:
-            notification = cls.objects.create(
-                recipient=recipient,
+        # Récupérer les destinataires (tous les participants sauf l'expéditeur),
+        # à partir de la seule clé de la conversation
+        recipient_ids = User.objects.filter(
+            conversations__id=message.conversation_id
+        ).exclude(id=message.sender_id).values_list('id', flat=True)
+        
+        title = _('Nouveau message')
+        content = _('Vous avez reçu un nouveau message de {}').format(message.sender.get_full_name() or message.sender.email)
+        
+        notifications = cls.objects.bulk_create([
+            cls(
+                recipient_id=recipient_id,
                 notification_type='new_message',
-                title=_('Nouveau message'),
-                content=_('Vous avez reçu un nouveau message de {}').format(message.sender.get_full_name() or message.sender.email),
-                related_conversation=message.conversation,
+                title=title,
+                content=content,
+                related_conversation_id=message.conversation_id,
                 related_object_id=str(message.id),
                 related_object_type='message'
             )
+            for recipient_id in recipient_ids
+        ])
+        
+        # bulk_create n'émet pas post_save : diffuser explicitement
+        for notification in notifications:
+            broadcast_notification(notification)
         
-        return notification
+        return notifications
 
 class DeviceToken(models.Model):
     """
@@ -5,6 +5,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from .models import Conversation, Message, Notification, DeviceToken
+from .tasks import schedule_notifications_for_message
 from accounts.serializers import UserSerializer
 from properties.models import Property
 from properties.serializers import PropertyListSerializer
@@ -30,25 +31,43 @@ class MessageSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    def contacts_revealed(self, obj):
+        """
+        Indique si les contacts de la conversation du message sont révélés.
+        Utilise l'ensemble 'revealed_conversation_ids' du contexte lorsque la
+        vue l'a calculé pour toute la page, sinon interroge le service.
+        """
+        revealed_ids = self.context.get('revealed_conversation_ids')
+        if revealed_ids is not None:
+            return obj.conversation_id in revealed_ids
+        
+        from .services.message_filter_service import MessageFilterService
+        return MessageFilterService.should_reveal_contacts(obj.conversation)
+    
     def get_content(self, obj):
         """Retourne le contenu approprié selon les autorisations."""
-        return obj.get_unfiltered_content()
+        if not obj.is_filtered:
+            # Rien n'a été masqué : inutile de vérifier la révélation des contacts
+            return obj.content
+        return obj.get_unfiltered_content(self.contacts_revealed(obj))
     
     def get_has_filtered_content(self, obj):
         """Indique si le message contient du contenu filtré."""
         return obj.is_filtered and obj.masked_items
     
     def get_anti_disintermediation_warning(self, obj):
-        """Retourne l'avertissement si nécessaire."""
-        from .services.message_filter_service import MessageFilterService
-        
-        if obj.is_filtered and obj.masked_items:
-            if not MessageFilterService.should_reveal_contacts(obj.conversation):
-                return MessageFilterService.get_anti_disintermediation_warning()
-        return None
+        """Retourne l'avertissement si nécessaire (voir Message.get_anti_disintermediation_warning)."""
+        if not (obj.is_filtered and obj.masked_items):
+            return None
+        return obj.get_anti_disintermediation_warning(self.contacts_revealed(obj))
     
     def get_is_read(self, obj):
         """Vérifie si le message a été lu par l'utilisateur actuel."""
+        # Ensemble calculé par la vue pour toute la page lorsqu'il existe
+        read_ids = self.context.get('read_message_ids')
+        if read_ids is not None:
+            return obj.id in read_ids
+        
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.is_read_by(request.user)
@@ -101,12 +120,13 @@ class MessageCreateSerializer(serializers.ModelSerializer):
             masked_items=masked_items
         )
         
-        # Mettre à jour la date de dernière mise à jour de la conversation
+        # Mettre à jour le dernier message et la date de dernière mise à jour de la conversation
+        conversation.last_message = message
         conversation.updated_at = message.created_at
-        conversation.save(update_fields=['updated_at'])
+        conversation.save(update_fields=['last_message', 'updated_at'])
         
-        # Créer des notifications pour les autres participants
-        Notification.create_for_new_message(message)
+        # Créer des notifications pour les autres participants (en arrière-plan)
+        schedule_notifications_for_message(message)
         
         return message
 
@@ -129,8 +149,8 @@ class ConversationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_last_message(self, obj):
-        """Récupère le dernier message de la conversation."""
-        last_message = obj.messages.order_by('-created_at').first()
+        """Récupère le dernier message de la conversation (dénormalisé, voir Conversation.last_message)."""
+        last_message = obj.last_message
         if last_message:
             return {
                 'id': last_message.id,
@@ -144,16 +164,26 @@ class ConversationSerializer(serializers.ModelSerializer):
     
     def get_unread_count(self, obj):
         """Compte le nombre de messages non lus pour l'utilisateur actuel."""
+        # Valeur annotée par ConversationQuerySet.with_unread_count lorsqu'elle existe
+        unread_count = getattr(obj, 'unread_count_annotated', None)
+        if unread_count is not None:
+            return unread_count
+        
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.messages.exclude(sender=request.user).exclude(read_by=request.user).count()
+            return obj.get_unread_count(request.user)
         return 0
     
     def get_other_participant(self, obj):
         """Récupère l'autre participant de la conversation (pour les conversations à deux)."""
         request = self.context.get('request')
-        if request and request.user.is_authenticated and obj.participants.count() == 2:
-            other_user = obj.participants.exclude(id=request.user.id).first()
+        if not request or not request.user.is_authenticated:
+            return None
+        
+        # Parcours des participants préchargés (pas de COUNT ni de requête dédiée)
+        participants = list(obj.participants.all())
+        if len(participants) == 2:
+            other_user = next((p for p in participants if p.id != request.user.id), None)
             if other_user:
                 return {
                     'id': other_user.id,
@@ -198,9 +228,11 @@ class ConversationCreateSerializer(serializers.Serializer):
             sender=sender,
             content=message_content
         )
+        conversation.last_message = message
+        conversation.save(update_fields=['last_message', 'updated_at'])
         
-        # Créer une notification pour le propriétaire
-        Notification.create_for_new_message(message)
+        # Créer une notification pour le propriétaire (en arrière-plan)
+        schedule_notifications_for_message(message)
         
         return conversation
 
@@ -3,6 +3,25 @@
 import re
 from typing import Tuple, List, Dict
 from django.conf import settings
+from django.core.cache import cache
+
+# Durée (secondes) de mise en cache de la révélation des contacts d'une conversation
+REVEAL_CONTACTS_CACHE_TIMEOUT = 300
+
+# Avertissement joint aux messages dont des coordonnées ont été masquées
+ANTI_DISINTERMEDIATION_WARNING = (
+    "🔒 Pour votre sécurité et celle de tous les utilisateurs, "
+    "restez sur la plateforme Findam pour toutes vos communications. "
+    "Les coordonnées seront disponibles après confirmation de votre réservation."
+)
+
+# Présélection : un message sans chiffre, sans '@' et sans aucun des mots-clés
+# ci-dessous ne peut correspondre à aucun des patterns de filtrage
+CONTACT_TRIGGER_RE = re.compile(
+    r'[\d@]|dot|whats|wa\.me|watsap|telegram|viber|imo|messenger'
+    r'|facebook|fb\.|instagram|twitter|tiktok|linkedin',
+    re.IGNORECASE
+)
 
 class MessageFilterService:
     """
@@ -21,9 +40,9 @@ class MessageFilterService:
     
     # Patterns pour emails (améliorés)
     EMAIL_PATTERNS = [
-        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-        r'\b[A-Za-z0-9._%+-]+\s*at\s*[A-Za-z0-9.-]+\s*dot\s*[A-Z|a-z]{2,}\b',  # "email at domain dot com"
-        r'\b[A-Za-z0-9._%+-]+\[@\][A-Za-z0-9.-]+\[.\][A-Z|a-z]{2,}\b',  # "email[@]domain[.]com"
+        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b',
+        r'\b[A-Za-z0-9._%+-]+\s*\bat\b\s*[A-Za-z0-9.-]+\s*\bdot\b\s*[A-Za-z]{2,}\b',  # "email at domain dot com"
+        r'\b[A-Za-z0-9._%+-]+\[@\][A-Za-z0-9.-]+\[.\][A-Za-z]{2,}\b',  # "email[@]domain[.]com"
     ]
     
     # Patterns pour WhatsApp et autres messageries
@@ -49,6 +68,22 @@ class MessageFilterService:
         r'\blinkedin\b',
     ]
     
+    # Une alternative compilée par catégorie (au chargement du module) :
+    # le contenu n'est parcouru qu'une fois par catégorie
+    PHONE_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in CAMEROON_PHONE_PATTERNS), re.IGNORECASE)
+    EMAIL_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in EMAIL_PATTERNS), re.IGNORECASE)
+    WHATSAPP_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in WHATSAPP_PATTERNS), re.IGNORECASE)
+    SOCIAL_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in SOCIAL_PATTERNS), re.IGNORECASE)
+    
+    # Ordre d'application : les textes de remplacement ne contiennent ni
+    # chiffre ni '@', ils ne sont donc jamais repris par une catégorie suivante
+    CONTACT_FILTERS = (
+        ('phone', PHONE_RE),
+        ('email', EMAIL_RE),
+        ('whatsapp', WHATSAPP_RE),
+        ('social', SOCIAL_RE),
+    )
+    
     WARNING_MESSAGES = {
         'phone': '[📱 Numéro masqué - Disponible après confirmation]',
         'email': '[📧 Email masqué - Disponible après confirmation]',
@@ -64,67 +99,82 @@ class MessageFilterService:
         if booking_confirmed:
             return content, []
         
+        # La plupart des messages ne contiennent aucun déclencheur : une seule passe suffit
+        if not content or not CONTACT_TRIGGER_RE.search(content):
+            return content, []
+        
         filtered_content = content
         masked_items = []
         
-        # Filtrer les numéros de téléphone camerounais
-        for pattern in cls.CAMEROON_PHONE_PATTERNS:
-            matches = re.findall(pattern, filtered_content, re.IGNORECASE)
-            if matches:
-                for match in matches:
-                    filtered_content = filtered_content.replace(match, cls.WARNING_MESSAGES['phone'])
-                masked_items.append('phone')
-        
-        # Filtrer les emails
-        for pattern in cls.EMAIL_PATTERNS:
-            matches = re.findall(pattern, filtered_content, re.IGNORECASE)
-            if matches:
-                for match in matches:
-                    filtered_content = filtered_content.replace(match, cls.WARNING_MESSAGES['email'])
-                masked_items.append('email')
-        
-        # Filtrer WhatsApp (case insensitive)
-        for pattern in cls.WHATSAPP_PATTERNS:
-            if re.search(pattern, filtered_content, re.IGNORECASE):
-                filtered_content = re.sub(pattern, cls.WARNING_MESSAGES['whatsapp'], 
-                                        filtered_content, flags=re.IGNORECASE)
-                masked_items.append('whatsapp')
+        # Téléphones, emails, WhatsApp puis réseaux sociaux : un seul passage
+        # de remplacement par catégorie
+        for item, pattern in cls.CONTACT_FILTERS:
+            filtered_content, count = pattern.subn(cls.WARNING_MESSAGES[item], filtered_content)
+            if count:
+                masked_items.append(item)
         
-        # Filtrer réseaux sociaux
-        for pattern in cls.SOCIAL_PATTERNS:
-            if re.search(pattern, filtered_content, re.IGNORECASE):
-                filtered_content = re.sub(pattern, cls.WARNING_MESSAGES['social'], 
-                                        filtered_content, flags=re.IGNORECASE)
-                masked_items.append('social')
-        
-        return filtered_content, list(set(masked_items))
+        return filtered_content, masked_items
     
     @classmethod
     def should_reveal_contacts(cls, conversation) -> bool:
         """
         Détermine si les contacts doivent être révélés dans une conversation.
         """
-        if not conversation.property:
+        return cls.should_reveal_contacts_for(conversation.pk, conversation.property_id)
+    
+    @staticmethod
+    def get_reveal_cache_key(conversation_id):
+        """Clé de cache de la révélation des contacts d'une conversation."""
+        return f"reveal:{conversation_id}"
+    
+    @classmethod
+    def should_reveal_contacts_for(cls, conversation_id, property_id) -> bool:
+        """
+        Variante de should_reveal_contacts travaillant sur les seules clés,
+        sans instance de conversation ni de logement.
+        Le résultat est mis en cache ; il est invalidé à chaque sauvegarde
+        d'une réservation du logement (voir communications.signals).
+        """
+        if not property_id:
             return False
         
-        # Vérifier s'il y a une réservation confirmée et payée
+        def load():
+            # Vérifier s'il y a une réservation confirmée et payée
+            from bookings.models import Booking
+            return Booking.objects.filter(
+                property_id=property_id,
+                tenant__conversations__id=conversation_id,
+                status='confirmed',
+                payment_status='paid'
+            ).exists()
+        
+        return cache.get_or_set(cls.get_reveal_cache_key(conversation_id), load, REVEAL_CONTACTS_CACHE_TIMEOUT)
+    
+    @classmethod
+    def get_revealed_conversation_ids(cls, conversation_ids) -> set:
+        """
+        Ensemble des conversations, parmi celles données, dont les contacts
+        sont révélés : une seule requête pour toute une page de messages.
+        """
+        from django.db.models import Exists, OuterRef
         from bookings.models import Booking
+        from ..models import Conversation
+        
         confirmed_booking = Booking.objects.filter(
-            property=conversation.property,
-            tenant__in=conversation.participants.all(),
+            property_id=OuterRef('property_id'),
+            tenant__conversations=OuterRef('pk'),
             status='confirmed',
             payment_status='paid'
-        ).exists()
-        
-        return confirmed_booking
+        )
+        return set(
+            Conversation.objects.filter(pk__in=conversation_ids)
+            .filter(Exists(confirmed_booking))
+            .values_list('pk', flat=True)
+        )
     
     @classmethod
     def get_anti_disintermediation_warning(cls) -> str:
         """
         Retourne le message d'avertissement anti-désintermédiation.
         """
-        return (
-            "🔒 Pour votre sécurité et celle de tous les utilisateurs, "
-            "restez sur la plateforme Findam pour toutes vos communications. "
-            "Les coordonnées seront disponibles après confirmation de votre réservation."
-        )
\ No newline at end of file
+        return ANTI_DISINTERMEDIATION_WARNING
\ No newline at end of file
@@ -1,13 +1,53 @@
 # communications/signals.py
 # Signaux pour les communications en temps réel
 
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from .models import Notification, Message
+from bookings.models import Booking
+from .models import Conversation, ConversationParticipant, Notification, Message
+from .services.message_filter_service import MessageFilterService
 from .serializers import NotificationSerializer
 
+def broadcast_notification(notification):
+    """
+    Envoie une notification au groupe WebSocket de son destinataire.
+    """
+    channel_layer = get_channel_layer()
+    
+    # Sérialiser la notification
+    serializer = NotificationSerializer(notification)
+    
+    # Envoyer la notification au groupe de l'utilisateur
+    notification_group_name = f'user_{notification.recipient_id}_notifications'
+    
+    async_to_sync(channel_layer.group_send)(
+        notification_group_name,
+        {
+            'type': 'new_notification',
+            'notification': serializer.data
+        }
+    )
+
+def broadcast_messages_read(conversation_id, user_id, message_ids):
+    """
+    Envoie un seul accusé de lecture au groupe WebSocket de la conversation
+    pour l'ensemble des messages lus.
+    """
+    channel_layer = get_channel_layer()
+    
+    async_to_sync(channel_layer.group_send)(
+        f'chat_{conversation_id}',
+        {
+            'type': 'messages_read',
+            'user_id': str(user_id),
+            'message_ids': [str(message_id) for message_id in message_ids]
+        }
+    )
+
 @receiver(post_save, sender=Notification)
 def notification_created(sender, instance, created, **kwargs):
     """
@@ -15,21 +55,7 @@ def notification_created(sender, instance, created, **kwargs):
     Envoie la notification au groupe WebSocket de l'utilisateur.
     """
     if created:
-        channel_layer = get_channel_layer()
-        
-        # Sérialiser la notification
-        serializer = NotificationSerializer(instance)
-        
-        # Envoyer la notification au groupe de l'utilisateur
-        notification_group_name = f'user_{instance.recipient.id}_notifications'
-        
-        async_to_sync(channel_layer.group_send)(
-            notification_group_name,
-            {
-                'type': 'new_notification',
-                'notification': serializer.data
-            }
-        )
+        broadcast_notification(instance)
 
 @receiver(post_save, sender=Message)
 def message_created(sender, instance, created, **kwargs):
@@ -59,4 +85,59 @@ def message_created(sender, instance, created, **kwargs):
                         'message_type': instance.message_type
                     }
                 }
-            )
\ No newline at end of file
+            )
+
+@receiver(post_delete, sender=Message)
+def refresh_last_message(sender, instance, **kwargs):
+    """
+    Recalcule le dernier message d'une conversation lorsque celui-ci est
+    supprimé (remis à NULL par on_delete=SET_NULL) à partir des messages restants.
+    """
+    last_message = Message.objects.filter(
+        conversation=OuterRef('pk')
+    ).order_by('-created_at').values('pk')[:1]
+    Conversation.objects.filter(
+        pk=instance.conversation_id, last_message__isnull=True
+    ).update(last_message=Subquery(last_message))
+
+@receiver(post_save, sender=ConversationParticipant)
+@receiver(post_delete, sender=ConversationParticipant)
+def invalidate_participant_access(sender, instance, **kwargs):
+    """
+    Invalide le droit d'accès en cache lors d'un retrait de participant
+    (remove, clear, suppression en cascade de la conversation).
+    """
+    cache.delete(Conversation.get_access_cache_key(instance.conversation_id, instance.user_id))
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def invalidate_added_participants_access(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalide le droit d'accès en cache lors d'un ajout de participants :
+    participants.add() insère en masse, sans signal post_save.
+    """
+    if action != 'post_add' or not pk_set:
+        return
+    
+    if reverse:
+        # user.conversations.add(...) : instance est l'utilisateur
+        keys = [Conversation.get_access_cache_key(pk, instance.pk) for pk in pk_set]
+    else:
+        keys = [Conversation.get_access_cache_key(instance.pk, pk) for pk in pk_set]
+    cache.delete_many(keys)
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_reveal_contacts(sender, instance, **kwargs):
+    """
+    Invalide la révélation des contacts en cache des conversations du
+    locataire au sujet du logement réservé (confirmation, paiement, annulation).
+    """
+    if not instance.tenant_id:
+        # Réservation externe : aucune conversation concernée
+        return
+    
+    conversation_ids = Conversation.objects.filter(
+        property_id=instance.property_id,
+        participants=instance.tenant_id
+    ).values_list('id', flat=True)
+    cache.delete_many([MessageFilterService.get_reveal_cache_key(pk) for pk in conversation_ids])
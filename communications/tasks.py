@@ -0,0 +1,67 @@
+# communications/tasks.py
+# Tâches exécutées en arrière-plan pour les communications
+
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection, transaction
+from .models import Message, Notification
+
+logger = logging.getLogger('findam')
+
+# Threads dédiés aux notifications : peu nombreux, les insertions se disputent
+# le verrou d'écriture de la base
+NOTIFICATION_WORKERS = 4
+
+# Nombre maximal de créations de notifications en attente ou en cours, comme
+# NOTIFICATION_TASKS_LIMIT côté WebSocket : au-delà, l'appelant attend qu'une
+# place se libère (contre-pression) au lieu d'empiler le travail
+NOTIFICATION_TASKS_LIMIT = 64
+
+notification_executor = ThreadPoolExecutor(
+    max_workers=NOTIFICATION_WORKERS,
+    thread_name_prefix='notifications'
+)
+notification_slots = threading.BoundedSemaphore(NOTIFICATION_TASKS_LIMIT)
+
+# Arrêt normal du processus : les notifications déjà soumises sont créées avant
+# la sortie. Un arrêt brutal (SIGKILL, plantage) perd celles encore en attente,
+# au plus NOTIFICATION_TASKS_LIMIT ; elles ne sont pas rejouées.
+atexit.register(notification_executor.shutdown, wait=True)
+
+def create_notifications_for_message(message_id):
+    """
+    Tâche créant (et diffusant) les notifications d'un nouveau message.
+    Exécutée dans un thread du pool : elle recharge le message et ferme sa
+    connexion à la base de données en fin de traitement.
+    """
+    try:
+        message = Message.objects.select_related('sender').get(pk=message_id)
+        Notification.create_for_new_message(message)
+    except Message.DoesNotExist:
+        logger.warning(f"Message {message_id} introuvable, notifications non créées")
+    except Exception as e:
+        logger.exception(f"Erreur lors de la création des notifications du message {message_id}: {str(e)}")
+    finally:
+        connection.close()
+        notification_slots.release()
+
+def schedule_notifications_for_message(message):
+    """
+    Programme la création des notifications d'un message dans le pool de
+    threads, une fois la transaction en cours validée : la réponse à
+    l'expéditeur n'attend ni les insertions ni la diffusion WebSocket.
+    """
+    message_id = message.pk
+    
+    def submit():
+        notification_slots.acquire()
+        try:
+            notification_executor.submit(create_notifications_for_message, message_id)
+        except RuntimeError:
+            # Pool déjà arrêté (fin du processus) : créer les notifications sur place
+            notification_slots.release()
+            Notification.create_for_new_message(message)
+    
+    transaction.on_commit(submit)
@@ -8,6 +8,7 @@ from django.db.models import Q
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Conversation, Message, Notification, DeviceToken
+from .signals import broadcast_messages_read
 from .serializers import (
     ConversationSerializer,
     ConversationCreateSerializer,
@@ -17,6 +18,7 @@ from .serializers import (
     DeviceTokenSerializer
 )
 from accounts.permissions import IsOwnerOfProfile
+from common.permissions import IsOwnerRole, IsTenantRole
 
 
 class ConversationViewSet(viewsets.ModelViewSet):
@@ -32,8 +34,13 @@ class ConversationViewSet(viewsets.ModelViewSet):
     
     def get_permissions(self):
         """
-        Authentification requise pour toutes les actions.
+        Authentification requise pour toutes les actions, certaines
+        actions réservées aux propriétaires ou aux locataires.
         """
+        if self.action in ['reveal_contacts']:
+            return [IsOwnerRole()]
+        if self.action in ['start_conversation', 'with_property']:
+            return [IsTenantRole()]
         return [permissions.IsAuthenticated()]
     
     def get_queryset(self):
@@ -46,15 +53,11 @@ class ConversationViewSet(viewsets.ModelViewSet):
             return Conversation.objects.none()
         
         if user.is_staff:
-            return Conversation.objects.all().prefetch_related(
-                'participants', 'messages'
-            ).select_related('property')
-        
-        return Conversation.objects.filter(
-            participants=user
-        ).prefetch_related(
-            'participants', 'messages'
-        ).select_related('property')
+            queryset = Conversation.objects.all()
+        else:
+            queryset = Conversation.objects.filter(participants=user)
+        
+        return queryset.for_list(user)
     
     def perform_create(self, serializer):
         """
@@ -70,7 +73,9 @@ class ConversationViewSet(viewsets.ModelViewSet):
         POST /api/v1/communications/conversations/{id}/mark_as_read/
         """
         conversation = self.get_object()
-        conversation.mark_as_read(request.user)
+        read_ids = conversation.mark_as_read(request.user)
+        if read_ids:
+            broadcast_messages_read(conversation.pk, request.user.id, read_ids)
         return Response({"detail": "Messages marqués comme lus."})
     
     @action(detail=False, methods=['post'])
@@ -180,11 +185,11 @@ class MessageViewSet(viewsets.ModelViewSet):
             return Message.objects.none()
         
         if user.is_staff:
-            return Message.objects.all().select_related('conversation', 'sender')
+            return Message.objects.all().for_list()
         
         return Message.objects.filter(
             conversation__participants=user
-        ).select_related('conversation', 'sender')
+        ).for_list()
     
     def perform_create(self, serializer):
         """
@@ -192,6 +197,35 @@ class MessageViewSet(viewsets.ModelViewSet):
         """
         serializer.save(sender=self.request.user)
     
+    def get_page_serializer(self, messages):
+        """
+        Sérialise une page de messages en déterminant la révélation des
+        contacts de toutes leurs conversations, puis les messages lus par
+        l'utilisateur, en une requête chacune.
+        """
+        from .services.message_filter_service import MessageFilterService
+        
+        context = self.get_serializer_context()
+        context['revealed_conversation_ids'] = MessageFilterService.get_revealed_conversation_ids(
+            {message.conversation_id for message in messages}
+        )
+        context['read_message_ids'] = set(
+            Message.read_by.through.objects.filter(
+                user_id=self.request.user.id,
+                message_id__in=[message.id for message in messages]
+            ).values_list('message_id', flat=True)
+        )
+        return MessageSerializer(messages, many=True, context=context)
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_page_serializer(page).data)
+        
+        return Response(self.get_page_serializer(list(queryset)).data)
+    
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         """
@@ -240,20 +274,18 @@ class MessageViewSet(viewsets.ModelViewSet):
         
         messages = Message.objects.filter(
             conversation_id=conversation_id
-        ).select_related('sender').order_by('created_at')
+        ).for_list().order_by('created_at')
         
-        # Marquer les messages comme lus
-        for message in messages:
-            if message.sender != request.user:
-                message.mark_as_read(request.user)
+        # Marquer les messages comme lus, avec un seul accusé de lecture WebSocket
+        read_ids = Conversation(pk=conversation_id).mark_as_read(request.user)
+        if read_ids:
+            broadcast_messages_read(conversation_id, request.user.id, read_ids)
         
         page = self.paginate_queryset(messages)
         if page is not None:
-            serializer = MessageSerializer(page, many=True, context={'request': request})
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(self.get_page_serializer(page).data)
         
-        serializer = MessageSerializer(messages, many=True, context={'request': request})
-        return Response(serializer.data)
+        return Response(self.get_page_serializer(list(messages)).data)
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
@@ -1,8 +1,19 @@
 # findam/asgi.py
+import asyncio
 import os
 import django
 from django.core.asgi import get_asgi_application
 
+# Boucle d'événements uvloop lorsqu'elle est installée (indisponible sous Windows).
+# Uvicorn la sélectionne de lui-même (--loop auto/uvloop) ; la politique couvre
+# les boucles créées ensuite (asyncio.run, serveurs qui n'en imposent pas).
+try:
+    import uvloop
+except ImportError:
+    pass
+else:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 # Configurer Django AVANT d'importer les modules WebSocket
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'findam.settings')
 django.setup()
@@ -57,7 +57,6 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'common.middleware.RoleBasedAccessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'bookings.signals.BookingStatusMiddleware',
@@ -84,12 +83,46 @@ TEMPLATES = [
 WSGI_APPLICATION = 'findam.wsgi.application'
 ASGI_APPLICATION = 'findam.asgi.application'
 
+# Couche de canaux (WebSocket)
+# La couche mémoire suffit en développement (un seul processus) ; en production,
+# utiliser la couche Redis Pub/Sub (paquet channels_redis) : une seule connexion
+# d'abonnement par boucle et un PUBLISH par group_send, quel que soit le nombre
+# de participants du groupe :
+# (la couche Pub/Sub garde ses connexions Redis ouvertes par boucle d'événements :
+# aucune connexion n'est ouverte par group_send)
+# CHANNEL_LAYERS = {
+#     'default': {
+#         'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+#         'CONFIG': {
+#             'hosts': [{
+#                 'address': 'redis://127.0.0.1:6379/2',
+#                 # Pool partagé par toutes les connexions d'un worker
+#                 'max_connections': 100,
+#             }],
+#         },
+#     },
+# }
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels.layers.InMemoryChannelLayer',
     },
 }
 
+# Cache (verrous de versement, mémoïsation)
+# Le cache local suffit en développement ; en production, utiliser Redis pour
+# que les verrous soient partagés entre tous les workers :
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': 'redis://127.0.0.1:6379/1',
+#     }
+# }
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
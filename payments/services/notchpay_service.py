@@ -6,12 +6,61 @@ import hmac
 import hashlib
 import logging
 import uuid
+from functools import lru_cache
 from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
+from bookings.models import Booking, PaymentTransaction
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger('findam')
 
+# URL de base de l'API NotchPay (sandbox et production partagent le même hôte)
+NOTCHPAY_BASE_URL = "https://api.notchpay.co"
+
+# Délais (connexion, lecture) appliqués à tout appel NotchPay sans timeout explicite
+NOTCHPAY_TIMEOUT = (3.05, 15)
+
+class _NotchPayHTTPAdapter(HTTPAdapter):
+    """Adaptateur HTTP appliquant un délai par défaut aux requêtes NotchPay."""
+    
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = NOTCHPAY_TIMEOUT
+        return super().send(request, **kwargs)
+
+_http_session = None
+
+def get_http_session():
+    """
+    Retourne la session HTTP partagée par le processus.
+    Les connexions TCP/TLS vers NotchPay sont réutilisées d'un appel à l'autre ;
+    seules les méthodes idempotentes (GET, DELETE...) sont rejouées en cas d'erreur 50x.
+    """
+    global _http_session
+    if _http_session is None:
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+        session = requests.Session()
+        session.mount('https://', _NotchPayHTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retry))
+        _http_session = session
+    return _http_session
+
+@lru_cache(maxsize=4)
+def _build_headers(public_key, private_key):
+    """
+    Construit une seule fois par couple de clés les en-têtes NotchPay :
+    les en-têtes standard et ceux des opérations de transfert (X-Grant).
+    Les dictionnaires retournés sont partagés et ne doivent pas être modifiés.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Authorization": public_key  # IMPORTANT: Utilisez la clé publique sans "Bearer"
+    }
+    grant_headers = {**headers, "X-Grant": private_key}  # Nécessaire pour les opérations de transfert
+    return headers, grant_headers
+
 class NotchPayService:
     """
     Service pour interagir avec l'API NotchPay.
@@ -22,13 +71,10 @@ class NotchPayService:
         """Initialisation avec les clés d'API depuis les paramètres de configuration"""
         self.private_key = settings.NOTCHPAY_PRIVATE_KEY
         self.public_key = getattr(settings, 'NOTCHPAY_PUBLIC_KEY', '')
-        self.base_url = "https://api.notchpay.co"
+        self.base_url = NOTCHPAY_BASE_URL
         self.is_sandbox = settings.NOTCHPAY_SANDBOX
-        self.headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": self.public_key  # IMPORTANT: Utilisez la clé publique sans "Bearer"
-        }
+        self.session = get_http_session()
+        self.headers, self.grant_headers = _build_headers(self.public_key, self.private_key)
     
     def initialize_payment(self, amount, currency="XAF", description=None, customer_info=None, 
                          metadata=None, callback_url=None, reference=None, success_url=None, cancel_url=None):
@@ -93,7 +139,7 @@ class NotchPayService:
         
         try:
             logger.info(f"Initialisation de paiement NotchPay pour {amount} {currency}")
-            response = requests.post(
+            response = self.session.post(
             f"{self.base_url}/payments",
             json=payload,
             headers=self.headers
@@ -103,13 +149,15 @@ class NotchPayService:
             logger.info(f"Réponse API NotchPay - Status: {response.status_code}")
             logger.info(f"Réponse API NotchPay - Headers: {response.headers}")
             try:
-                logger.info(f"Réponse API NotchPay - Body: {response.json()}")
-            except:
-                logger.info(f"Réponse API NotchPay - Body: {response.text}")
+                payment_data = response.json()
+            except ValueError:
+                payment_data = None
+            logger.info(f"Réponse API NotchPay - Body: {payment_data if payment_data is not None else response.text}")
             
             # Vérifier la réponse
             response.raise_for_status()
-            payment_data = response.json()
+            if payment_data is None:
+                payment_data = response.json()
             
             logger.info(f"Paiement NotchPay initialisé avec succès: {payment_data.get('transaction', {}).get('reference')}")
             return payment_data
@@ -151,7 +199,7 @@ class NotchPayService:
         
         try:
             logger.info(f"Traitement du paiement {payment_reference} via {payment_method}")
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/payments/{payment_reference}",
                 json=payload,
                 headers=self.headers
@@ -185,7 +233,6 @@ class NotchPayService:
             logger.info(f"Vérification du statut du paiement {payment_reference}")
             
             # 1. D'abord, rechercher dans la base de données par transaction_id exact
-            from bookings.models import PaymentTransaction
             transaction = PaymentTransaction.objects.filter(transaction_id=payment_reference).first()
             
             notchpay_ref = None
@@ -205,7 +252,6 @@ class NotchPayService:
                     booking_id = f"{parts[1]}-{parts[2]}-{parts[3]}-{parts[4]}"
                     
                     # Chercher dans la base de données avec cet ID
-                    from bookings.models import Booking
                     try:
                         booking = Booking.objects.get(id=booking_id)
                         # Trouver la transaction associée
@@ -233,7 +279,7 @@ class NotchPayService:
             # 4. Si on a trouvé une référence valide, faire la requête à NotchPay
             if notchpay_ref:
                 logger.info(f"Utilisation de la référence NotchPay: {notchpay_ref}")
-                response = requests.get(
+                response = self.session.get(
                     f"{self.base_url}/payments/{notchpay_ref}",
                     headers=self.headers
                 )
@@ -282,7 +328,7 @@ class NotchPayService:
         Vérifier la signature d'un webhook NotchPay
         
         Args:
-            payload (str): Le corps de la requête en string
+            payload (bytes|str): Le corps brut de la requête (request.body)
             signature_header (str): La signature dans l'en-tête X-Notch-Signature
             
         Returns:
@@ -291,12 +337,14 @@ class NotchPayService:
         if not signature_header or not settings.NOTCHPAY_HASH_KEY:
             return False
         
+        # Les octets bruts sont hachés tels quels, sans décodage/ré-encodage
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        
         # Calculer la signature locale
-        computed_signature = hmac.new(
-            settings.NOTCHPAY_HASH_KEY.encode('utf-8'),
-            payload.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
+        digest = hmac.new(settings.NOTCHPAY_HASH_KEY.encode('utf-8'), digestmod=hashlib.sha256)
+        digest.update(memoryview(payload))
+        computed_signature = digest.hexdigest()
         
         # Comparer avec la signature reçue
         return hmac.compare_digest(computed_signature, signature_header)
@@ -309,7 +357,7 @@ class NotchPayService:
             list: Liste des canaux de paiement disponibles
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/channels",
                 headers=self.headers
             )
@@ -343,7 +391,7 @@ class NotchPayService:
         """
         try:
             logger.info(f"Annulation du paiement {payment_reference}")
-            response = requests.delete(
+            response = self.session.delete(
                 f"{self.base_url}/payments/{payment_reference}",
                 headers=self.headers
             )
@@ -370,11 +418,10 @@ class NotchPayService:
         try:
             logger.info(f"Récupération des destinataires NotchPay")
             
-            # Mettre à jour les en-têtes pour utiliser la clé privée
-            headers = self.headers.copy()
-            headers['X-Grant'] = self.private_key  # Nécessaire pour les opérations de transfert
+            # En-têtes avec la clé privée, nécessaires pour les opérations de transfert
+            headers = self.grant_headers
             
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/recipients",
                 headers=headers
             )
@@ -413,9 +460,8 @@ class NotchPayService:
             logger.info(f"Création d'un destinataire NotchPay")
             logger.info(f"Données envoyées: {recipient_data}")
             
-            # Mettre à jour les en-têtes pour utiliser la clé privée
-            headers = self.headers.copy()
-            headers['X-Grant'] = self.private_key  # Nécessaire pour les opérations de transfert
+            # En-têtes avec la clé privée, nécessaires pour les opérations de transfert
+            headers = self.grant_headers
             
             # Vérifier que les champs obligatoires sont présents
             # Selon l'API réelle NotchPay: channel, account_number, email, country, name
@@ -426,7 +472,7 @@ class NotchPayService:
                 logger.error(f"Champs obligatoires manquants: {missing_fields}")
                 raise ValueError(f"Les champs suivants sont obligatoires : {', '.join(missing_fields)}")
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/recipients",
                 json=recipient_data,
                 headers=headers
@@ -492,11 +538,10 @@ class NotchPayService:
             
             logger.info(f"Initiation de transfert NotchPay: {amount} {currency} à {recipient}")
             
-            # Mettre à jour les en-têtes pour utiliser la clé privée
-            headers = self.headers.copy()
-            headers['X-Grant'] = self.private_key  # Nécessaire pour les opérations de transfert
+            # En-têtes avec la clé privée, nécessaires pour les opérations de transfert
+            headers = self.grant_headers
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/transfers",
                 json=payload,
                 headers=headers
@@ -536,11 +581,10 @@ class NotchPayService:
         try:
             logger.info(f"Récupération des détails du transfert: {transfer_reference}")
             
-            # Mettre à jour les en-têtes pour utiliser la clé privée
-            headers = self.headers.copy()
-            headers['X-Grant'] = self.private_key  # Nécessaire pour les opérations de transfert
+            # En-têtes avec la clé privée, nécessaires pour les opérations de transfert
+            headers = self.grant_headers
             
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/transfers/{transfer_reference}",
                 headers=headers
             )
@@ -608,7 +652,7 @@ class NotchPayService:
             logger.info(f"Requête de remboursement NotchPay: {payload}")
             
             # Effectuer la requête de création de paiement (remboursement)
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/payments",
                 json=payload,
                 headers=self.headers
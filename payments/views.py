@@ -28,7 +28,7 @@ class PaymentMethodViewSet(viewsets.ModelViewSet):
     ViewSet pour gérer les méthodes de paiement avec activation et vérification.
     """
     serializer_class = PaymentMethodSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [IsOwnerRole]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['nickname', 'phone_number']
     ordering_fields = ['created_at', 'is_active', 'status']
@@ -36,12 +36,12 @@ class PaymentMethodViewSet(viewsets.ModelViewSet):
     
     def get_permissions(self):
         """
-        Authentification requise, certaines actions réservées aux admins.
+        Réservé aux propriétaires, certaines actions réservées aux admins.
         """
         if self.action in ['bulk_verify']:
             permission_classes = [IsAdminUser]
         else:
-            permission_classes = [permissions.IsAuthenticated]
+            permission_classes = [IsOwnerRole]
         
         return [permission() for permission in permission_classes]
     
@@ -469,7 +469,7 @@ class PayoutViewSet(viewsets.ModelViewSet):
     ViewSet pour gérer les versements.
     """
     serializer_class = PayoutSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [IsOwnerRole]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status']
     search_fields = ['notes', 'external_reference']
@@ -483,7 +483,7 @@ class PayoutViewSet(viewsets.ModelViewSet):
         if self.action in ['confirm', 'mark_completed', 'mark_failed', 'pending', 'schedule', 'cancel_schedule', 'mark_ready', 'scheduled', 'ready', 'process_scheduled', 'process_ready', 'schedule_for_booking']:
             permission_classes = [permissions.IsAdminUser]
         else:
-            permission_classes = [permissions.IsAuthenticated]
+            permission_classes = [IsOwnerRole]
         
         return [permission() for permission in permission_classes]
     
@@ -53,22 +53,22 @@ def notchpay_webhook(request):
     # Récupérer la signature dans l'en-tête
     signature = request.headers.get('X-Notch-Signature', '')
     
-    # Récupérer le corps de la requête comme une chaîne
-    payload_str = request.body.decode('utf-8')
+    # Récupérer le corps brut de la requête
+    payload_bytes = request.body
     
     # Initialiser le service NotchPay
     notchpay_service = NotchPayService()
     
     # Vérifier la signature
-    if signature and not notchpay_service.verify_webhook_signature(payload_str, signature):
+    if signature and not notchpay_service.verify_webhook_signature(payload_bytes, signature):
         logger.warning(f"Signature de webhook NotchPay invalide: {signature}")
-        logger.debug(f"Payload reçu (début): {payload_str[:100]}...")
+        logger.debug(f"Payload reçu (début): {payload_bytes[:100]!r}...")
         logger.debug(f"NOTCHPAY_HASH_KEY configurée: {settings.NOTCHPAY_HASH_KEY[:10]}...")
         return HttpResponse("Invalid signature", status=400)
     
     try:
         # Analyser le payload JSON
-        payload = json.loads(payload_str)
+        payload = json.loads(payload_bytes)
         event_type = payload.get('event')
         event_data = payload.get('data', {})
         
@@ -87,7 +87,7 @@ def notchpay_webhook(request):
         return JsonResponse({"status": "success"})
         
     except json.JSONDecodeError:
-        logger.error(f"Impossible de décoder le payload JSON du webhook: {payload_str}")
+        logger.error(f"Impossible de décoder le payload JSON du webhook: {payload_bytes!r}")
         return HttpResponse("Invalid JSON", status=400)
     except Exception as e:
         logger.exception(f"Erreur lors du traitement du webhook NotchPay: {str(e)}")
@@ -101,8 +101,6 @@ def handle_payment_success(data):
     merchant_reference = data.get('merchant_reference', '')
     
     # Mettre à jour directement toutes les transactions correspondantes
-    from bookings.models import PaymentTransaction, Booking
-    
     # 1. Chercher par référence NotchPay dans payment_response
     transactions_updated = False
     
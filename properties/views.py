@@ -156,8 +156,8 @@ class PropertyViewSet(viewsets.ModelViewSet):
         elif self.action in ['update', 'partial_update', 'destroy']:
             # Modification/suppression par le propriétaire du logement
             permission_classes = [IsOwnerRole, IsOwnerOfProperty]
-        elif self.action in ['publish', 'unpublish']:
-            # Gestion de publication par le propriétaire
+        elif self.action in ['publish', 'unpublish', 'add_external_booking']:
+            # Gestion de publication et réservations externes par le propriétaire
             permission_classes = [IsOwnerRole, IsOwnerOfProperty]
         elif self.action in ['verify']:
             # Vérification uniquement par les admins
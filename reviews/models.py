@@ -3,6 +3,7 @@
 
 import uuid
 from django.db import models
+from django.db.models import Avg, Count
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -71,16 +72,16 @@ class Review(models.Model):
         
         # Calculer la note moyenne (uniquement sur les avis publics)
         if self.is_public:
-            property_reviews = Review.objects.filter(
-                property=self.property,
+            # Moyenne et nombre calculés par la base, sans charger les avis
+            stats = Review.objects.filter(
+                property_id=self.property_id,
                 is_public=True
-            )
+            ).aggregate(avg=Avg('rating'), count=Count('id'))
             
-            total_rating = sum(review.rating for review in property_reviews)
-            count = property_reviews.count()
+            count = stats['count']
             
             if count > 0:
-                self.property.avg_rating = total_rating / count
+                self.property.avg_rating = stats['avg']
                 self.property.rating_count = count
                 self.property.save(update_fields=['avg_rating', 'rating_count'])
 
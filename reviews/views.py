@@ -7,7 +7,7 @@ from rest_framework.response import Response
 from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Review, ReviewReply, ReportedReview
-from common.permissions import IsOwnerRole
+from common.permissions import IsOwnerRole, IsTenantRole
 from .serializers import (
     ReviewSerializer,
     ReviewCreateSerializer,
@@ -79,6 +79,9 @@ class ReviewViewSet(viewsets.ModelViewSet):
         elif self.action == 'create':
             # Il faut être authentifié pour créer un avis
             permission_classes = [permissions.IsAuthenticated]
+        elif self.action == 'my_reviews':
+            # Avis rédigés par le locataire connecté
+            permission_classes = [IsTenantRole]
         else:
             # Les actions de lecture sont publiques
             permission_classes = [permissions.AllowAny]